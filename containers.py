@@ -1,10 +1,20 @@
 import databases
 from dependency_injector import containers, providers
 
+from helpers.background_jobs import BackgroundJobs
+from helpers.compression import Compressor
+from helpers.configuration_cache import ConfigurationCache
+from helpers.single_flight import SingleFlight
 from services.application_service import ApplicationService
 from services.environment_service import EnvironmentService
 from services.variable_service import VariableService
 from services.change_history_service import ChangeHistoryService
+from services.change_history_writer import ChangeHistoryWriter
+from services.checkpoint_service import CheckpointService
+from services.change_notification_service import ChangeNotificationService
+from services.configuration_service import ConfigurationService
+from services.snapshot_service import SnapshotService
+from services.transfer_service import TransferService
 
 
 class Container(containers.DeclarativeContainer):
@@ -16,27 +26,92 @@ class Container(containers.DeclarativeContainer):
         url=config.db.connection_string
     )
 
+    configuration_cache = providers.Singleton(
+        ConfigurationCache,
+        max_size=config.configuration_cache.max_size,
+        ttl=config.configuration_cache.ttl
+    )
+
+    single_flight = providers.Singleton(SingleFlight)
+
+    compressor = providers.Singleton(
+        Compressor,
+        min_size=config.compression.min_size,
+        gzip_level=config.compression.gzip_level,
+        brotli_quality=config.compression.brotli_quality,
+        cache_size=config.compression.cache_size
+    )
+
+    background_jobs = providers.Singleton(BackgroundJobs)
+
+    history_writer = providers.Singleton(
+        ChangeHistoryWriter,
+        database=database,
+        mode=config.change_history.mode,
+        queue_size=config.change_history.queue_size,
+        batch_size=config.change_history.batch_size,
+        flush_interval=config.change_history.flush_interval
+    )
+
+    snapshot_service = providers.Factory(
+        SnapshotService,
+        database=database
+    )
+
+    checkpoint_service = providers.Factory(
+        CheckpointService,
+        database=database
+    )
+
     var_service = providers.Factory(
         VariableService,
-        database=database
+        database=database,
+        snapshot_service=snapshot_service,
+        configuration_cache=configuration_cache,
+        history_writer=history_writer
     )
 
     env_service = providers.Factory(
         EnvironmentService,
         database=database,
-        var_service=var_service
+        var_service=var_service,
+        snapshot_service=snapshot_service,
+        configuration_cache=configuration_cache,
+        history_writer=history_writer
     )
 
     app_service = providers.Factory(
         ApplicationService,
         database=database,
-        env_service=env_service
+        env_service=env_service,
+        history_writer=history_writer
     )
 
     change_history_service = providers.Factory(
         ChangeHistoryService,
+        database=database
+    )
+
+    transfer_service = providers.Factory(
+        TransferService,
         database=database,
-        app_service=app_service,
-        env_service=env_service,
-        var_service=var_service
+        snapshot_service=snapshot_service
+    )
+
+    change_notification_service = providers.Singleton(
+        ChangeNotificationService,
+        connection_string=config.db.connection_string,
+        configuration_cache=configuration_cache,
+        max_subscribers=config.stream.max_subscribers
+    )
+
+    configuration_service = providers.Factory(
+        ConfigurationService,
+        snapshot_service=snapshot_service,
+        var_service=var_service,
+        checkpoint_service=checkpoint_service,
+        configuration_cache=configuration_cache,
+        change_notification_service=change_notification_service,
+        single_flight=single_flight,
+        compressor=compressor
     )
@@ -1,9 +1,16 @@
+from typing import AsyncIterator, Optional
+
 from dependency_injector.wiring import inject, Provide
-from fastapi import APIRouter, Depends, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 
 from schemas import application_schemas
 from services.application_service import ApplicationService
-from services.change_history_service import ChangeHistoryService
+from services.transfer_service import TransferConflictError, TransferFormatError, TransferService
+from helpers.pagination import InvalidCursorError, get_total, next_cursor
+from helpers.projection import InvalidFieldsError, parse_fields, project
+from helpers.background_jobs import BackgroundJobs
 from containers import Container
 
 
@@ -25,20 +32,58 @@ async def create(
     return app
 
 
+@router.post("/applications/import", response_model=application_schemas.ApplicationImportResultSchema, status_code=201)
+@inject
+async def import_application(
+    request: Request,
+    transfer_service: TransferService = Depends(Provide[Container.transfer_service])
+) -> Response:
+    """Creates an application with its environments and variables
+    from NDJSON document made by export
+
+    """
+
+    try:
+        return await transfer_service.import_application(_read_lines(request))
+    except TransferFormatError as exc:
+        raise HTTPException(status_code=422, detail=f"{exc}")
+    except TransferConflictError as exc:
+        raise HTTPException(status_code=409, detail=f"{exc}")
+
+
+@router.get("/applications/{app_id}/export", response_class=StreamingResponse)
+@inject
+async def export_application(
+    app_id: int,
+    app_service: ApplicationService = Depends(Provide[Container.app_service]),
+    transfer_service: TransferService = Depends(Provide[Container.transfer_service])
+) -> Response:
+    """Exports an application with its environments and variables
+    as NDJSON document, one entity per line
+
+    """
+
+    application = await app_service.get_one(app_id)
+
+    if application is None or application['is_deleted']:
+        raise HTTPException(status_code=404, detail="Application not found")
+
+    return StreamingResponse(
+        transfer_service.export_application(app_id),
+        media_type="application/x-ndjson"
+    )
+
+
 @router.put("/applications/{app_id}", response_model=application_schemas.ApplicationSchema)
 @inject
 async def update(
     app_id: int, 
     app_data: application_schemas.ApplicationCreateSchema,
-    app_service: ApplicationService = Depends(Provide[Container.app_service]),
-    change_hostory_service: ChangeHistoryService = Depends(Provide[Container.change_history_service])
+    app_service: ApplicationService = Depends(Provide[Container.app_service])
 ) -> Response:
     """Updates an application by id
 
     """
-    
-    await change_hostory_service.make_history(app_id, 'applications', app_data)
-
     return await app_service.update(app_id, app_data)
 
 
@@ -46,13 +91,28 @@ async def update(
 @inject
 async def delete(
     app_id: int,
-    app_service: ApplicationService = Depends(Provide[Container.app_service])
+    background: bool = Query(False, description="Delete in batches by a background job"),
+    app_service: ApplicationService = Depends(Provide[Container.app_service]),
+    background_jobs: BackgroundJobs = Depends(Provide[Container.background_jobs])
 ) -> Response:
     """Deletes an application by id
 
+    With `background` the application is hidden at once and its
+    environments and variables are deleted in batches, the answer
+    is `202 Accepted` with a job, which progress is available
+    by `GET /jobs/{job_id}`
+
     """
 
-    await app_service.delete(app_id=app_id)
+    if background:
+        job = background_jobs.start(
+            f'Delete application {app_id}',
+            lambda progress: app_service.delete_in_batches(app_id, progress)
+        )
+
+        return JSONResponse(status_code=202, content=jsonable_encoder(job.get_state()))
+
+    await app_service.delete(app_id)
     
     return {'deleted': app_id}
 
@@ -62,13 +122,64 @@ async def delete(
 async def get_list(
     page: int = 1,
     per_page: int = 10,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    approximate_total: bool = False,
+    fields: Optional[str] = Query(None, description="Comma separated fields of entities to return, e.g. id,name"),
     app_service: ApplicationService = Depends(Provide[Container.app_service])
 ) -> Response:
-    """Gets all existing applications
+    """Gets all existing applications, total count is selected
+    by the same query unless `include_total` is false, and is estimated
+    by planner statistics if `approximate_total` is true
 
     """
 
-    total_count = await app_service.get_count()
-    applications = await app_service.get_list(page, per_page)
-    
-    return {"total_count": total_count, "data": applications}
+    selected_fields = parse_fields(fields)
+
+    try:
+        applications = await app_service.get_list(
+            page,
+            per_page,
+            cursor,
+            include_total,
+            approximate_total,
+            selected_fields
+        )
+    except (InvalidCursorError, InvalidFieldsError) as exc:
+        raise HTTPException(status_code=400, detail=f"{exc}")
+
+    total_count = None
+
+    if include_total:
+        total_count = await get_total(applications, app_service.get_count)
+
+    result = {
+        "total_count": total_count,
+        "data": applications,
+        "next_cursor": next_cursor(applications, per_page)
+    }
+
+    if selected_fields:
+        # Projected entities are not validated by the full response model
+        return JSONResponse(
+            content=jsonable_encoder({**result, "data": project(applications, selected_fields)})
+        )
+
+    return result
+
+
+async def _read_lines(request: Request) -> AsyncIterator[bytes]:
+    """Splits request body into lines as it arrives
+
+    """
+
+    rest = b""
+
+    async for chunk in request.stream():
+        *lines, rest = (rest + chunk).split(b"\n")
+
+        for line in lines:
+            yield line
+
+    if rest:
+        yield rest
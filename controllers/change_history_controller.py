@@ -1,14 +1,33 @@
+from typing import Optional
+
 from dependency_injector.wiring import inject, Provide
-from fastapi import APIRouter, Depends, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 
+from helpers.pagination import InvalidCursorError, get_total, next_cursor
+from helpers.projection import InvalidFieldsError, parse_fields, project
 from schemas import change_history_schemas
 from services.change_history_service import ChangeHistoryService
+from services.change_history_writer import ChangeHistoryWriter
 from containers import Container
 
 
 router = APIRouter(tags=['history'])
 
 
+@router.get("/history/writer", response_model=change_history_schemas.ChangeHistoryWriterStatsSchema)
+@inject
+async def get_writer_stats(
+    history_writer: ChangeHistoryWriter = Depends(Provide[Container.history_writer])
+) -> Response:
+    """Gets queue depth and flush latency of change history writer
+
+    """
+
+    return history_writer.get_stats()
+
+
 @router.get("/history/{entity_type}/{entity_id}", response_model=change_history_schemas.ChangeHistoryListSchema)
 @inject
 async def get_history(
@@ -16,18 +35,49 @@ async def get_history(
     entity_id: int,
     page: int = 1,
     per_page: int = 10,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    fields: Optional[str] = Query(None, description="Comma separated fields of entities to return, e.g. id,name"),
     change_hostory_service: ChangeHistoryService = Depends(Provide[Container.change_history_service])
 ) -> Response:
-    """Gets history of entity by its type and id
+    """Gets history of entity by its type and id, total count
+    is selected by the same query unless `include_total` is false
 
     """
 
-    total_count = await change_hostory_service.get_count(entity_type, entity_id)
-    entity_history = await change_hostory_service.get_list(
-        entity_type, 
-        entity_id,
-        page, 
-        per_page
-    )
-    
-    return {"total_count": total_count, "data": entity_history}
+    selected_fields = parse_fields(fields)
+
+    try:
+        entity_history = await change_hostory_service.get_list(
+            entity_type,
+            entity_id,
+            page,
+            per_page,
+            cursor,
+            include_total,
+            selected_fields
+        )
+    except (InvalidCursorError, InvalidFieldsError) as exc:
+        raise HTTPException(status_code=400, detail=f"{exc}")
+
+    total_count = None
+
+    if include_total:
+        total_count = await get_total(
+            entity_history,
+            lambda: change_hostory_service.get_count(entity_type, entity_id)
+        )
+
+    result = {
+        "total_count": total_count,
+        "data": entity_history,
+        "next_cursor": next_cursor(entity_history, per_page)
+    }
+
+    if selected_fields:
+        # Projected entities are not validated by the full response model
+        return JSONResponse(
+            content=jsonable_encoder({**result, "data": project(entity_history, selected_fields)})
+        )
+
+    return result
@@ -1,9 +1,15 @@
+import json
+from datetime import datetime
+from typing import Dict, Optional
+
 from dependency_injector.wiring import inject, Provide
-from fastapi import APIRouter, Depends, Response
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 
 from schemas import configuration_schemas
-from services.variable_service import VariableService
-from services.environment_service import EnvironmentService
+from services.configuration_service import ConfigurationService
+from services.change_notification_service import SubscriptionLimitError
+from helpers import configuration_formats
 from helpers.dependencies import basic_auth
 from containers import Container
 
@@ -12,21 +18,266 @@ router = APIRouter(tags=['configurations'])
 
 
 @router.get(
-    "/configurations", 
+    "/configurations",
     response_model=configuration_schemas.ConfigurationSchema,
     dependencies=[Depends(basic_auth)]
 )
 @inject
 async def get_configuration(
     code: str,
-    var_service: VariableService = Depends(Provide[Container.var_service]),
-    env_service: EnvironmentService = Depends(Provide[Container.env_service])
+    wait: float = Query(0, ge=0, description="Seconds to wait for a new version"),
+    version: Optional[str] = Query(None, description="ETag of the known version"),
+    format: Optional[str] = Query(
+        None,
+        regex="^(json|flat|dotenv|msgpack)$",
+        description="Output format, negotiated by Accept header if omitted"
+    ),
+    as_of: Optional[datetime] = Query(
+        None,
+        description="Point in time to return configuration at, local time of the database "
+        "if it has no offset, current configuration if omitted"
+    ),
+    accept: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    long_poll_max_wait: float = Depends(Provide[Container.config.long_poll.max_wait]),
+    configuration_service: ConfigurationService = Depends(Provide[Container.configuration_service])
 ) -> Response:
     """Gets app configuration by environment unique code
 
+    Answers `304 Not Modified` when `If-None-Match` header
+    contains ETag of the current configuration version
+
+    With `wait` and `version` (or `If-None-Match`) the request is parked
+    until the configuration version changes or `wait` seconds expire
+
+    Besides the full JSON document, configuration can be returned as
+    `name -> value` map in flat JSON (`flat`), `.env` file (`dotenv`)
+    or MessagePack (`msgpack`)
+
+    Configuration is compressed by gzip or brotli negotiated by
+    `Accept-Encoding` header, compressed content is cached per version
+    and its ETag is suffixed by the encoding, e.g. `"<digest>-gzip"`
+
+    With `as_of` the configuration is rebuilt as it was at that time
+    from the nearest checkpoint and change history recorded after it,
+    such responses are not cached and do not carry ETag
+
+    """
+
+    format = configuration_formats.negotiate(format, accept)
+
+    if as_of is not None:
+        configuration = await configuration_service.get_configuration_as_of(code, as_of, format)
+
+        if configuration is None:
+            raise HTTPException(status_code=404, detail="Environment not found")
+
+        return Response(
+            content=configuration['content'],
+            media_type=configuration_formats.MEDIA_TYPES[format],
+            headers={"Vary": "Accept"}
+        )
+
+    if version is not None and not version.startswith('"'):
+        version = f'"{version}"'
+
+    known_etag = version or if_none_match
+
+    if wait and known_etag is not None:
+        try:
+            has_changed = await configuration_service.wait_for_change(
+                code,
+                known_etag,
+                min(wait, long_poll_max_wait),
+                format
+            )
+        except SubscriptionLimitError as exc:
+            raise HTTPException(status_code=503, detail=f"{exc}")
+
+        if not has_changed:
+            return Response(
+                status_code=304,
+                headers={"ETag": known_etag, "Vary": "Accept"}
+            )
+    elif if_none_match is not None:
+        etag = await configuration_service.get_etag(code, format)
+        matched_etag = _match_etag(if_none_match, etag) if etag is not None else None
+
+        if matched_etag is not None:
+            return Response(
+                status_code=304,
+                headers={"ETag": matched_etag, "Vary": "Accept, Accept-Encoding"}
+            )
+
+    configuration = await configuration_service.get_configuration(code, format)
+
+    if configuration is None:
+        raise HTTPException(status_code=404, detail="Environment not found")
+
+    content, encoding, etag = configuration_service.encode_configuration(
+        configuration,
+        accept_encoding
+    )
+    headers = {"ETag": etag, "Vary": "Accept, Accept-Encoding"}
+
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+
+    return Response(
+        content=content,
+        media_type=configuration_formats.MEDIA_TYPES[format],
+        headers=headers
+    )
+
+
+@router.get(
+    "/configurations/changes",
+    response_model=configuration_schemas.ConfigurationChangesSchema,
+    dependencies=[Depends(basic_auth)]
+)
+@inject
+async def get_configuration_changes(
+    code: str,
+    since: int = Query(..., ge=0, description="Known configuration version, 0 for all variables"),
+    configuration_service: ConfigurationService = Depends(Provide[Container.configuration_service])
+) -> Response:
+    """Gets variables of environment created, updated or deleted
+    after the passed configuration version along with the new version
+
+    Deleted variables are returned with `is_deleted` set,
+    so client is able to remove them from its copy
+
+    """
+
+    changes = await configuration_service.get_changes(code, since)
+
+    if changes is None:
+        raise HTTPException(status_code=404, detail="Environment not found")
+
+    return changes
+
+
+@router.post(
+    "/configurations/bulk",
+    response_model=Dict[str, configuration_schemas.ConfigurationSchema],
+    dependencies=[Depends(basic_auth)]
+)
+@inject
+async def get_configurations(
+    request_data: configuration_schemas.ConfigurationsBulkRequestSchema,
+    configuration_service: ConfigurationService = Depends(Provide[Container.configuration_service])
+) -> Response:
+    """Gets app configurations of many environments by their unique codes
+    as a JSON object keyed by code, unknown codes are omitted
+
+    """
+
+    async def document():
+        separator = "{"
+
+        async for configuration in configuration_service.iterate_configurations(request_data.codes):
+            yield f"{separator}{json.dumps(configuration['code'])}:".encode()
+            yield configuration['content']
+            separator = ","
+
+        yield b"{}" if separator == "{" else b"}"
+
+    return StreamingResponse(document(), media_type="application/json")
+
+
+@router.get(
+    "/configurations/stream",
+    response_class=StreamingResponse,
+    dependencies=[Depends(basic_auth)]
+)
+@inject
+async def stream_configuration(
+    request: Request,
+    code: str,
+    last_event_id: Optional[str] = Header(None),
+    keepalive: float = Depends(Provide[Container.config.stream.keepalive]),
+    configuration_service: ConfigurationService = Depends(Provide[Container.configuration_service])
+) -> Response:
+    """Streams app configuration by environment unique code
+    as Server-Sent Events, a new snapshot is pushed on every change
+
+    Snapshot events carry ETag of configuration version as event id,
+    so reconnecting client with `Last-Event-ID` header does not
+    receive the version it already has
+
+    """
+
+    if await configuration_service.get_etag(code) is None:
+        raise HTTPException(status_code=404, detail="Environment not found")
+
+    try:
+        configurations = configuration_service.stream_configuration(
+            code,
+            last_event_id,
+            keepalive
+        )
+    except SubscriptionLimitError as exc:
+        raise HTTPException(status_code=503, detail=f"{exc}")
+
+    async def events():
+        try:
+            async for configuration in configurations:
+                if configuration is None:
+                    if await request.is_disconnected():
+                        return
+
+                    yield ": keepalive\n\n"
+                    continue
+
+                data = "".join(
+                    f"data: {line}\n"
+                    for line in configuration['content'].decode().split("\n")
+                )
+                yield f"id: {configuration['etag']}\nevent: configuration\n{data}\n"
+        finally:
+            await configurations.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+@router.get(
+    "/configurations/cache",
+    response_model=configuration_schemas.ConfigurationCacheStatsSchema,
+    dependencies=[Depends(basic_auth)]
+)
+@inject
+async def get_cache_stats(
+    configuration_service: ConfigurationService = Depends(Provide[Container.configuration_service])
+) -> Response:
+    """Gets hit/miss/eviction counters of configuration cache
+    and number of coalesced reads
+
+    """
+
+    return configuration_service.get_cache_stats()
+
+
+def _match_etag(if_none_match: str, etag: str) -> Optional[str]:
+    """Finds tag of `If-None-Match` header value which matches ETag
+    of configuration version in any of its encodings
+
     """
 
-    environment = await env_service.get_one_by_code(code)    
-    variables = await var_service.get_list(environment['id'])
+    if if_none_match.strip() == '*':
+        return etag
+
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+
+        if tag.startswith('W/'):
+            tag = tag[2:]
+
+        if ConfigurationService.strip_encoding(tag) == etag:
+            return tag
 
-    return {'environment_name': environment['name'], 'variables': variables}
+    return None
@@ -1,9 +1,14 @@
+from typing import Optional
+
 from dependency_injector.wiring import inject, Provide
-from fastapi import APIRouter, Depends, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 
+from helpers.pagination import InvalidCursorError, get_total, next_cursor
+from helpers.projection import InvalidFieldsError, parse_fields, project
 from schemas import environment_schemas
 from services.environment_service import EnvironmentService
-from services.change_history_service import ChangeHistoryService
 from containers import Container
 
 
@@ -29,20 +34,41 @@ async def create(
     return environment
 
 
+@router.post(
+    "/environments/{env_id}/clone",
+    response_model=environment_schemas.EnvironmentSchema,
+    status_code=201
+)
+@inject
+async def clone(
+    env_id: int,
+    env_data: environment_schemas.EnvironmentCloneSchema,
+    env_service: EnvironmentService = Depends(Provide[Container.env_service])
+) -> Response:
+    """Creates a new environment with a new code
+    and a copy of variables of environment by id
+
+    """
+
+    environment = await env_service.clone(env_id, env_data)
+
+    if environment is None:
+        raise HTTPException(status_code=404, detail="Environment not found")
+
+    return environment
+
+
 @router.put("/environments/{env_id}", response_model=environment_schemas.EnvironmentSchema)
 @inject
 async def update(
     env_id: int, 
     env_data: environment_schemas.EnvironmentUpdateSchema,
-    env_service: EnvironmentService = Depends(Provide[Container.env_service]),
-    change_hostory_service: ChangeHistoryService = Depends(Provide[Container.change_history_service])
+    env_service: EnvironmentService = Depends(Provide[Container.env_service])
 ) -> Response:
     """Updates an environment by id
 
     """
 
-    await change_hostory_service.make_history(env_id, 'environments', env_data)
-
     return await env_service.update(id=env_id, data=env_data)
 
 
@@ -56,7 +82,7 @@ async def delete(
 
     """
 
-    await env_service.delete(env_id=env_id)
+    await env_service.delete(env_id)
     
     return {'deleted': env_id}
 
@@ -67,13 +93,45 @@ async def get_list(
     app_id: int,
     page: int = 1,
     per_page: int = 10,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    fields: Optional[str] = Query(None, description="Comma separated fields of entities to return, e.g. id,name"),
     env_service: EnvironmentService = Depends(Provide[Container.env_service])
 ) -> Response:
-    """Gets all existing environments for application
+    """Gets all existing environments for application, total count
+    is selected by the same query unless `include_total` is false
 
     """
 
-    total_count = await env_service.get_count(app_id)
-    envs = await env_service.get_list(app_id, page, per_page)
-    
-    return {"total_count": total_count, "data": envs}
+    selected_fields = parse_fields(fields)
+
+    try:
+        envs = await env_service.get_list(
+            app_id,
+            page,
+            per_page,
+            cursor,
+            include_total,
+            selected_fields
+        )
+    except (InvalidCursorError, InvalidFieldsError) as exc:
+        raise HTTPException(status_code=400, detail=f"{exc}")
+
+    total_count = None
+
+    if include_total:
+        total_count = await get_total(envs, lambda: env_service.get_count(app_id))
+
+    result = {
+        "total_count": total_count,
+        "data": envs,
+        "next_cursor": next_cursor(envs, per_page)
+    }
+
+    if selected_fields:
+        # Projected entities are not validated by the full response model
+        return JSONResponse(
+            content=jsonable_encoder({**result, "data": project(envs, selected_fields)})
+        )
+
+    return result
@@ -0,0 +1,27 @@
+from dependency_injector.wiring import inject, Provide
+from fastapi import APIRouter, Depends, HTTPException, Response
+
+from schemas import job_schemas
+from helpers.background_jobs import BackgroundJobs
+from containers import Container
+
+
+router = APIRouter(tags=['jobs'])
+
+
+@router.get("/jobs/{job_id}", response_model=job_schemas.JobSchema)
+@inject
+async def get_job(
+    job_id: str,
+    background_jobs: BackgroundJobs = Depends(Provide[Container.background_jobs])
+) -> Response:
+    """Gets state and progress of background job by id
+
+    """
+
+    job = background_jobs.get(job_id)
+
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job.get_state()
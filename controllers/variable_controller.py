@@ -1,9 +1,14 @@
+from typing import Optional
+
 from dependency_injector.wiring import inject, Provide
-from fastapi import APIRouter, Depends, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 
+from helpers.pagination import InvalidCursorError, get_total, next_cursor
+from helpers.projection import InvalidFieldsError, parse_fields, project
 from schemas import variable_schemas
-from services.variable_service import VariableService
-from services.change_history_service import ChangeHistoryService
+from services.variable_service import InvalidSearchError, VariableNameConflictError, VariableService
 from containers import Container
 
 
@@ -20,26 +25,71 @@ async def create(
 
     """
 
-    variable = await var_service.create(variable)
+    try:
+        variable = await var_service.create(variable)
+    except VariableNameConflictError as exc:
+        raise HTTPException(status_code=409, detail=f"{exc}")
     
     return variable
 
 
+@router.post("/variables/bulk", response_model=variable_schemas.VariablesBulkResultSchema)
+@inject
+async def bulk_upsert(
+    request_data: variable_schemas.VariablesBulkUpsertSchema,
+    var_service: VariableService = Depends(Provide[Container.var_service])
+) -> Response:
+    """Creates or updates many variables in one transaction,
+    existing variables are matched by environment and name
+
+    """
+
+    results = await var_service.bulk_upsert(request_data.variables)
+
+    return {"data": results}
+
+
+@router.get("/variables/search", response_model=variable_schemas.VariablesSearchSchema)
+@inject
+async def search(
+    query: str = Query(..., min_length=1, description="Searched text"),
+    field: Optional[str] = Query(None, regex="^(name|value)$", description="Searched field, both if omitted"),
+    mode: str = Query("substring", regex="^(prefix|substring|exact)$"),
+    per_page: int = Query(10, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    var_service: VariableService = Depends(Provide[Container.var_service])
+) -> Response:
+    """Searches variables of all applications by name or value,
+    e.g. which environments reference a host or define a feature flag
+
+    """
+
+    try:
+        variables = await var_service.search(query, field, mode, per_page, cursor)
+    except (InvalidCursorError, InvalidSearchError) as exc:
+        raise HTTPException(status_code=400, detail=f"{exc}")
+
+    return {
+        "data": variables,
+        "next_cursor": next_cursor(variables, per_page)
+    }
+
+
 @router.put("/variables/{var_id}", response_model=variable_schemas.VariableSchema)
 @inject
 async def update(
     var_id: int, 
     var_data: variable_schemas.VariableUpdateSchema,
-    var_service: VariableService = Depends(Provide[Container.var_service]),
-    change_hostory_service: ChangeHistoryService = Depends(Provide[Container.change_history_service])
+    var_service: VariableService = Depends(Provide[Container.var_service])
 ) -> Response:
     """Updates an variable by id
 
     """
 
-    await change_hostory_service.make_history(var_id, 'variables', var_data)
-
-    return await var_service.update(id=var_id, data=var_data)
+    try:
+        return await var_service.update(id=var_id, data=var_data)
+    except VariableNameConflictError as exc:
+        raise HTTPException(status_code=409, detail=f"{exc}")
 
 
 @router.delete("/variables/{var_id}", status_code=200)
@@ -52,7 +102,7 @@ async def delete(
 
     """
 
-    await var_service.delete(var_id=var_id)
+    await var_service.delete(var_id)
     
     return {'deleted': var_id}
 
@@ -63,13 +113,45 @@ async def get_list(
     env_id: int,
     page: int = 1,
     per_page: int = 10,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    fields: Optional[str] = Query(None, description="Comma separated fields of entities to return, e.g. id,name"),
     var_service: VariableService = Depends(Provide[Container.var_service])
 ) -> Response:
-    """Gets all existing variables for environment
+    """Gets all existing variables for environment, total count
+    is selected by the same query unless `include_total` is false
 
     """
 
-    total_count = await var_service.get_count(env_id)
-    variables = await var_service.get_list(env_id, page, per_page)
-    
-    return {"total_count": total_count, "data": variables}
+    selected_fields = parse_fields(fields)
+
+    try:
+        variables = await var_service.get_list(
+            env_id,
+            page,
+            per_page,
+            cursor,
+            include_total,
+            selected_fields
+        )
+    except (InvalidCursorError, InvalidFieldsError) as exc:
+        raise HTTPException(status_code=400, detail=f"{exc}")
+
+    total_count = None
+
+    if include_total:
+        total_count = await get_total(variables, lambda: var_service.get_count(env_id))
+
+    result = {
+        "total_count": total_count,
+        "data": variables,
+        "next_cursor": next_cursor(variables, per_page)
+    }
+
+    if selected_fields:
+        # Projected entities are not validated by the full response model
+        return JSONResponse(
+            content=jsonable_encoder({**result, "data": project(variables, selected_fields)})
+        )
+
+    return result
@@ -0,0 +1,155 @@
+import asyncio
+import contextvars
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+
+Progress = Callable[[int, int], None]
+
+
+class Job:
+    """State of a background job
+
+    """
+
+    def __init__(self, name: str) -> None:
+        """Construct a new :class: `Job`
+
+        :param `name` - human readable name of job
+
+        """
+
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.status = 'running'
+        self.done = 0
+        self.total = None
+        self.error = None
+        self.created_at = datetime.now()
+        self.finished_at = None
+        self.task: Optional[asyncio.Task] = None
+
+    def set_progress(self, done: int, total: int) -> None:
+        """Updates progress of job
+
+        :param `done` - number of processed items
+
+        :param `total` - number of items to process
+
+        """
+
+        self.done = done
+        self.total = total
+
+    def get_state(self) -> dict:
+        """Returns state of job
+
+        """
+
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'done': self.done,
+            'total': self.total,
+            'error': self.error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at
+        }
+
+
+class BackgroundJobs:
+    """Runs long operations as tasks of the current event loop
+    and keeps their progress
+
+    Jobs live in the memory of a single worker, so their state
+    is available only from the worker which started them.
+
+    """
+
+    def __init__(self, max_finished: int = 100) -> None:
+        """Construct a new :class: `BackgroundJobs`
+
+        :optional param `max_finished` - number of finished jobs
+        kept for progress requests
+
+        """
+
+        self.max_finished = max_finished
+        self._jobs = OrderedDict()
+
+    def start(
+        self,
+        name: str,
+        function: Callable[[Progress], Awaitable[None]]
+    ) -> Job:
+        """Starts a new background job
+
+        :param `name` - human readable name of job
+
+        :param `function` - coroutine function which accepts
+        `progress(done, total)` callback
+
+        :return an instance of `Job`
+
+        """
+
+        job = Job(name)
+        # Empty context keeps the job from sharing database connection,
+        # which `databases` keeps in a context variable, with the request
+        job.task = contextvars.Context().run(
+            asyncio.ensure_future,
+            self._run(job, function)
+        )
+        self._jobs[job.id] = job
+
+        return job
+
+    def get(self, id: str) -> Optional[Job]:
+        """Returns job by its identifier
+
+        :param `id` - identifier of job
+
+        :return an instance of `Job` or `None` if it is unknown
+
+        """
+
+        return self._jobs.get(id)
+
+    async def stop(self) -> None:
+        """Cancels running jobs
+
+        """
+
+        tasks = [job.task for job in self._jobs.values() if not job.task.done()]
+
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(
+        self,
+        job: Job,
+        function: Callable[[Progress], Awaitable[None]]
+    ) -> None:
+        try:
+            await function(job.set_progress)
+            job.status = 'completed'
+        except asyncio.CancelledError:
+            job.status = 'cancelled'
+            raise
+        except Exception as exc:
+            job.status = 'failed'
+            job.error = f'{exc}'
+        finally:
+            job.finished_at = datetime.now()
+            self._forget_finished()
+
+    def _forget_finished(self) -> None:
+        finished = [id for id, job in self._jobs.items() if job.finished_at is not None]
+
+        for id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[id]
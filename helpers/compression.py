@@ -0,0 +1,211 @@
+import gzip
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+GZIP = 'gzip'
+BROTLI = 'br'
+
+COMPRESSIBLE_MEDIA_TYPES = (
+    'application/json',
+    'application/x-msgpack',
+    'text/'
+)
+
+
+class Compressor:
+    """Negotiates and applies response compression, compressed
+    payloads of versioned content are kept in a bounded LRU cache,
+    so that a popular configuration is compressed once per version
+
+    Brotli is used only if the `brotli` package is installed.
+
+    """
+
+    def __init__(
+        self,
+        min_size: int,
+        gzip_level: int = 6,
+        brotli_quality: int = 5,
+        cache_size: int = 1024
+    ) -> None:
+        """Construct a new :class: `Compressor`
+
+        :param `min_size` - responses smaller than this number
+        of bytes are not compressed
+
+        :optional param `gzip_level` - gzip compression level from 1 to 9
+
+        :optional param `brotli_quality` - brotli quality from 0 to 11
+
+        :optional param `cache_size` - maximum number of cached
+        compressed payloads
+
+        """
+
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_size = cache_size
+        self._entries: Dict[Tuple[str, str], bytes] = OrderedDict()
+        self.compressions = 0
+        self.hits = 0
+
+    @property
+    def encodings(self) -> Tuple[str, ...]:
+        """Supported encodings in the order of preference
+
+        """
+
+        return (BROTLI, GZIP) if brotli is not None else (GZIP,)
+
+    def negotiate(self, accept_encoding: Optional[str], size: int) -> Optional[str]:
+        """Chooses encoding of response
+
+        :param `accept_encoding` - value of `Accept-Encoding` header
+
+        :param `size` - size of response body in bytes
+
+        :return `br`, `gzip` or `None` if response is left uncompressed
+
+        """
+
+        if not accept_encoding or size < self.min_size:
+            return None
+
+        weights = {}
+
+        for item in accept_encoding.split(','):
+            coding, _, parameters = item.partition(';')
+            weight = 1.0
+
+            if parameters.strip().startswith('q='):
+                try:
+                    weight = float(parameters.strip()[2:])
+                except ValueError:
+                    weight = 0.0
+
+            weights[coding.strip().lower()] = weight
+
+        def weight(encoding: str) -> float:
+            return weights.get(encoding, weights.get('*', 0.0))
+
+        accepted = [encoding for encoding in self.encodings if weight(encoding) > 0]
+
+        # The first of equally weighted encodings is preferred
+        return max(accepted, key=weight) if accepted else None
+
+    def compress(self, content: bytes, encoding: str, key: Optional[str] = None) -> bytes:
+        """Compresses content
+
+        :param `content` - response body
+
+        :param `encoding` - `br` or `gzip`
+
+        :optional param `key` - key of the content version, e.g. strong
+        ETag, compressed content is cached by it if it is passed
+
+        :return compressed content
+
+        """
+
+        if key is not None:
+            compressed = self._entries.get((key, encoding))
+
+            if compressed is not None:
+                self._entries.move_to_end((key, encoding))
+                self.hits += 1
+
+                return compressed
+
+        if encoding == BROTLI:
+            compressed = brotli.compress(content, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(content, compresslevel=self.gzip_level)
+
+        self.compressions += 1
+
+        if key is not None:
+            self._entries[(key, encoding)] = compressed
+
+            while len(self._entries) > self.cache_size:
+                self._entries.popitem(last=False)
+
+        return compressed
+
+    def get_stats(self) -> dict:
+        """Returns compression counters
+
+        """
+
+        return {
+            'compressions': self.compressions,
+            'compressed_hits': self.hits
+        }
+
+
+class CompressionMiddleware:
+    """Compresses complete responses of compressible media types,
+    streamed responses and responses which already have
+    `Content-Encoding` are passed as is
+
+    """
+
+    def __init__(self, app: ASGIApp, compressor: Compressor) -> None:
+        self.app = app
+        self.compressor = compressor
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get('accept-encoding')
+        start = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start
+
+            if message['type'] == 'http.response.start':
+                start = message
+                return
+
+            if start is None:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start['headers'])
+            body = message.get('body', b'')
+
+            if (
+                message.get('more_body', False)
+                or 'content-encoding' in headers
+                or not headers.get('content-type', '').startswith(COMPRESSIBLE_MEDIA_TYPES)
+                or len(body) < self.compressor.min_size
+            ):
+                await send(start)
+                start = None
+                await send(message)
+                return
+
+            headers.add_vary_header('Accept-Encoding')
+            encoding = self.compressor.negotiate(accept_encoding, len(body))
+
+            if encoding is not None:
+                body = self.compressor.compress(body, encoding)
+                headers['Content-Encoding'] = encoding
+                headers['Content-Length'] = str(len(body))
+
+            await send(start)
+            start = None
+            await send({'type': 'http.response.body', 'body': body})
+
+        await self.app(scope, receive, send_compressed)
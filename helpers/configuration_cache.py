@@ -0,0 +1,198 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+
+class ConfigurationCache:
+    """Bounded in-process LRU cache with TTL for rendered configurations
+
+    Entries are keyed by environment code and output format and tagged
+    with the environment identifier, so that write paths, which only
+    know identifiers, are able to evict them.
+
+    The cache lives in the memory of a single worker, so the TTL
+    bounds how long other workers may serve a stale configuration.
+
+    Every invalidation advances `generation`, values loaded before
+    an invalidation are not cached, as they may be already stale.
+
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        """Construct a new :class: `ConfigurationCache`
+
+        :param `max_size` - maximum number of cached configurations
+
+        :param `ttl` - lifetime of cached configuration in seconds
+
+        """
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._keys_by_env_id: Dict[int, Set[Tuple[str, str]]] = {}
+        self._keys_by_code: Dict[str, Set[Tuple[str, str]]] = {}
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, code: str, format: str = 'json') -> Optional[Any]:
+        """Returns cached value for environment code
+
+        :param `code` - unique code of environment
+
+        :optional param `format` - output format of configuration
+
+        :return cached value or `None` if it is missing or expired
+
+        """
+
+        key = (code, format)
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        env_id, value, expires_at = entry
+
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.evictions += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+
+        return value
+
+    def peek(self, code: str, format: str = 'json') -> Optional[Any]:
+        """Returns cached value for environment code without counting
+        a hit or a miss, e.g. for version checks which fall back to
+        a version lookup instead of loading configuration
+
+        :param `code` - unique code of environment
+
+        :optional param `format` - output format of configuration
+
+        :return cached value or `None` if it is missing or expired
+
+        """
+
+        entry = self._entries.get((code, format))
+
+        if entry is None or entry[2] <= time.monotonic():
+            return None
+
+        return entry[1]
+
+    def set(
+        self,
+        code: str,
+        env_id: int,
+        value: Any,
+        format: str = 'json',
+        generation: Optional[int] = None
+    ) -> None:
+        """Puts value to the cache
+
+        :param `code` - unique code of environment
+
+        :param `env_id` - identifier of environment
+
+        :param `value` - value to cache
+
+        :optional param `format` - output format of configuration
+
+        :optional param `generation` - cache generation at the moment
+        when value loading started, value is skipped if cache
+        was invalidated since then
+
+        """
+
+        if generation is not None and generation != self.generation:
+            return
+
+        key = (code, format)
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (env_id, value, time.monotonic() + self.ttl)
+        self._keys_by_env_id.setdefault(env_id, set()).add(key)
+        self._keys_by_code.setdefault(code, set()).add(key)
+
+        while len(self._entries) > self.max_size:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def invalidate(self, env_ids: Iterable[int]) -> None:
+        """Evicts cached configurations of environments
+
+        :param `env_ids` - identifiers of changed environments
+
+        """
+
+        self.generation += 1
+
+        for env_id in env_ids:
+            for key in list(self._keys_by_env_id.get(env_id, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def invalidate_code(self, code: str) -> None:
+        """Evicts cached configurations of environment by its code
+
+        :param `code` - unique code of changed environment
+
+        """
+
+        self.generation += 1
+
+        for key in list(self._keys_by_code.get(code, ())):
+            self._remove(key)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        """Evicts all cached configurations
+
+        """
+
+        self.generation += 1
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._keys_by_env_id.clear()
+        self._keys_by_code.clear()
+
+    def get_stats(self) -> dict:
+        """Returns cache counters
+
+        """
+
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        env_id, _, _ = self._entries.pop(key)
+        _discard(self._keys_by_env_id, env_id, key)
+        _discard(self._keys_by_code, key[0], key)
+
+
+def _discard(index: dict, index_key: Any, key: Tuple[str, str]) -> None:
+    keys = index.get(index_key)
+
+    if keys is not None:
+        keys.discard(key)
+
+        if not keys:
+            del index[index_key]
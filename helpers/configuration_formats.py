@@ -0,0 +1,104 @@
+import json
+import re
+from typing import Dict, Optional
+
+import msgpack
+
+
+JSON = 'json'
+FLAT = 'flat'
+DOTENV = 'dotenv'
+MSGPACK = 'msgpack'
+
+MEDIA_TYPES = {
+    JSON: 'application/json',
+    FLAT: 'application/json',
+    DOTENV: 'text/plain',
+    MSGPACK: 'application/x-msgpack'
+}
+
+# Names which dotenv parsers read as a single key
+DOTENV_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_.]*$')
+
+ACCEPT_FORMATS = {
+    'application/x-msgpack': MSGPACK,
+    'application/msgpack': MSGPACK
+}
+
+
+def negotiate(format: Optional[str], accept: Optional[str]) -> str:
+    """Chooses output format of configuration
+
+    :param `format` - format requested explicitly, takes precedence
+
+    :param `accept` - value of `Accept` header
+
+    :return name of output format
+
+    """
+
+    if format is not None:
+        return format
+
+    for media_type in (accept or '').split(','):
+        media_type = media_type.split(';')[0].strip().lower()
+
+        if media_type in ACCEPT_FORMATS:
+            return ACCEPT_FORMATS[media_type]
+
+    return JSON
+
+
+def render(values: Dict[str, str], format: str) -> bytes:
+    """Renders `name -> value` map of variables in compact format
+
+    :param `values` - variable values by their names
+
+    :param `format` - one of `FLAT`, `DOTENV` or `MSGPACK`
+
+    :return rendered document, variables with names which are
+    not valid in `.env` are skipped in `DOTENV` and reported
+    by a comment at the top
+
+    """
+
+    if format == FLAT:
+        return json.dumps(values, ensure_ascii=False, separators=(',', ':')).encode()
+
+    if format == DOTENV:
+        return _render_dotenv(values).encode()
+
+    if format == MSGPACK:
+        return msgpack.packb(values, use_bin_type=True)
+
+    raise ValueError(f'Unexpected configuration format {format}!')
+
+
+def _render_dotenv(values: Dict[str, str]) -> str:
+    lines = []
+    skipped = 0
+
+    for name, value in values.items():
+        # Names with `=`, whitespace or line breaks would corrupt the file
+        if name is None or not DOTENV_NAME.match(name):
+            skipped += 1
+            continue
+
+        lines.append(f'{name}="{_escape_dotenv(value)}"\n')
+
+    if skipped:
+        lines.insert(0, f'# Skipped variables with names not valid in .env: {skipped}\n')
+
+    return ''.join(lines)
+
+
+def _escape_dotenv(value: Optional[str]) -> str:
+    if value is None:
+        return ''
+
+    return (
+        value.replace('\\', '\\\\')
+        .replace('"', '\\"')
+        .replace('\n', '\\n')
+        .replace('$', '\\$')
+    )
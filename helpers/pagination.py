@@ -0,0 +1,162 @@
+import base64
+import json
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from sqlalchemy import Table, desc, func, literal_column, select, tuple_
+from sqlalchemy.sql import ColumnElement, Select
+
+
+class InvalidCursorError(ValueError):
+    """Raised when pagination cursor is malformed
+
+    """
+
+
+def paginate(
+    query: Select,
+    table: Table,
+    per_page: Optional[int],
+    page: Optional[int] = None,
+    cursor: Optional[str] = None,
+    total: Optional[ColumnElement] = None
+) -> Select:
+    """Orders query by creation date and identifier, newest first,
+    and limits it to one page
+
+    Page after cursor is selected by comparison with the last row
+    of the previous page, which is resolved by an index on
+    `(created_at, id)` and does not depend on page depth, otherwise
+    page is selected by its number with `OFFSET`.
+
+    :param `query` - query which selects rows of table
+
+    :param `table` - table with `created_at` and `id` columns
+
+    :param `per_page` - number of entities on one page, query
+    is not limited if it is `None`
+
+    :optional param `page` - page number
+
+    :optional param `cursor` - cursor of the previous page
+    returned by `next_cursor`
+
+    :optional param `total` - expression of total number of rows,
+    such as `exact_total()`, which is selected as `total_count` column
+    of every row, so that the total does not need a separate query
+
+    :return query of one page
+
+    :raise `InvalidCursorError` if cursor is malformed
+
+    """
+
+    columns = table.c
+
+    if total is not None:
+        query = query.column(total.label('total_count'))
+
+    if cursor is not None:
+        created_at, id = decode_cursor(cursor)
+
+        if total is not None:
+            # Total is calculated over all rows, not only after the cursor
+            query = query.alias('page')
+            columns = query.c
+            query = select([query])
+
+        query = query.where(tuple_(columns.created_at, columns.id) < tuple_(created_at, id))
+    elif page and per_page:
+        query = query.offset((page - 1) * per_page)
+
+    query = query.order_by(desc(columns.created_at), desc(columns.id))
+
+    if per_page:
+        query = query.limit(per_page)
+
+    return query
+
+
+def exact_total() -> ColumnElement:
+    """Returns expression which counts rows matched by query
+    in the same scan with its window
+
+    """
+
+    return func.count().over()
+
+
+def estimated_total(index_name: str) -> ColumnElement:
+    """Returns expression which estimates number of rows by planner
+    statistics of index, statistics are refreshed by `ANALYZE`
+    and `VACUUM`, so the estimate is cheap but may lag behind
+
+    :param `index_name` - name of index which covers exactly
+    the rows matched by query, e.g. partial index with the same condition
+
+    """
+
+    return literal_column(
+        f"(SELECT greatest(reltuples, 0)::bigint FROM pg_class WHERE oid = '{index_name}'::regclass)"
+    )
+
+
+async def get_total(rows: List, count: Callable[[], Awaitable[int]]) -> int:
+    """Returns total number of rows selected by `paginate` with `total`,
+    rows are counted by `count` if the page is empty
+
+    :param `rows` - rows of page
+
+    :param `count` - coroutine function which counts rows
+
+    :return total number of rows
+
+    """
+
+    if rows:
+        return rows[0]['total_count']
+
+    return await count()
+
+
+def next_cursor(rows: List, per_page: int) -> Optional[str]:
+    """Returns cursor of the page following the passed one
+
+    :param `rows` - rows of page with `created_at` and `id`
+
+    :param `per_page` - number of entities on one page
+
+    :return cursor or `None` if page is the last one
+
+    """
+
+    if not rows or len(rows) < per_page:
+        return None
+
+    return encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """Returns opaque cursor which points to row
+
+    """
+
+    value = json.dumps([created_at.isoformat(), id]).encode()
+
+    return base64.urlsafe_b64encode(value).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Returns creation date and identifier of row which cursor points to
+
+    :raise `InvalidCursorError` if cursor is malformed
+
+    """
+
+    try:
+        value = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, id = json.loads(value)
+
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursorError(f'Invalid cursor: {exc}')
@@ -0,0 +1,72 @@
+from typing import List, Optional
+
+from sqlalchemy import Column
+
+
+# Columns which pagination by cursor relies on
+REQUIRED_COLUMNS = ('id', 'created_at')
+
+
+class InvalidFieldsError(ValueError):
+    """Raised when requested fields are not columns of entity
+
+    """
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Returns list of fields from comma separated string
+
+    :param `fields` - comma separated names of fields, e.g. `id,name`
+
+    :return list of unique field names in the passed order
+    or `None` if fields are not passed
+
+    """
+
+    if not fields:
+        return None
+
+    return list(dict.fromkeys(field.strip() for field in fields.split(',') if field.strip()))
+
+
+def select_columns(columns: List[Column], fields: Optional[List[str]]) -> List[Column]:
+    """Narrows columns of query to the requested fields
+
+    :param `columns` - all columns of entity which may be selected
+
+    :param `fields` - names of requested fields, all columns
+    are selected if it is `None`
+
+    :return requested columns and columns required for pagination
+
+    :raise `InvalidFieldsError` if some of fields is not a column
+
+    """
+
+    if not fields:
+        return columns
+
+    names = [column.name for column in columns]
+    unknown = [field for field in fields if field not in names]
+
+    if unknown:
+        raise InvalidFieldsError(f'Unknown fields: {", ".join(unknown)}')
+
+    return [
+        column for column in columns
+        if column.name in fields or column.name in REQUIRED_COLUMNS
+    ]
+
+
+def project(rows: List, fields: List[str]) -> List[dict]:
+    """Returns only requested fields of rows
+
+    :param `rows` - rows selected with `select_columns`
+
+    :param `fields` - names of requested fields
+
+    :return list of dictionaries
+
+    """
+
+    return [{field: row[field] for field in fields} for row in rows]
@@ -0,0 +1,71 @@
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls with the same key,
+    so that they share one in-flight call and its result
+
+    The shared call runs in its own task with an empty context, so
+    cancellation of the first caller does not affect the others and
+    the call does not share database connection of the first caller,
+    which `databases` keeps in a context variable.
+
+    """
+
+    def __init__(self) -> None:
+        """Construct a new :class: `SingleFlight`
+
+        """
+
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(
+        self,
+        key: Hashable,
+        function: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Calls function unless a call with the same key is in flight,
+        otherwise waits for result of that call
+
+        :param `key` - key of the call
+
+        :param `function` - coroutine function without arguments
+
+        :return result of the call
+
+        """
+
+        call = self._calls.get(key)
+
+        if call is None:
+            call = contextvars.Context().run(asyncio.ensure_future, function())
+            self._calls[key] = call
+            call.add_done_callback(lambda done: self._forget(key, done))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(call)
+
+    def get_stats(self) -> dict:
+        """Returns call counters
+
+        """
+
+        return {
+            'in_flight': len(self._calls),
+            'calls': self.calls,
+            'coalesced': self.coalesced
+        }
+
+    def _forget(self, key: Hashable, call: asyncio.Future) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+        # Retrieve exception for the case when all callers were cancelled
+        if not call.cancelled():
+            call.exception()
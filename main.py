@@ -12,9 +12,11 @@ from controllers import (
     environment_controller,
     variable_controller, 
     configuration_controller,
-    change_history_controller
+    change_history_controller,
+    job_controller
 )
 from helpers import dependencies
+from helpers.compression import CompressionMiddleware
 from containers import Container
 
 tags_metadata = [
@@ -33,6 +35,10 @@ tags_metadata = [
     {
         "name": "variables",
         "description": "Operations with variables."
+    },
+    {
+        "name": "jobs",
+        "description": "Progress of background jobs."
     }
 ]
 
@@ -47,6 +53,7 @@ def create_app() -> FastAPI:
             variable_controller, 
             configuration_controller,
             change_history_controller,
+            job_controller,
             dependencies
         ]
     )
@@ -62,11 +69,13 @@ def create_app() -> FastAPI:
         openapi_tags=tags_metadata
     )
     app.container = container
+    app.add_middleware(CompressionMiddleware, compressor=container.compressor())
     app.include_router(application_controller.router)
     app.include_router(environment_controller.router)
     app.include_router(variable_controller.router)
     app.include_router(configuration_controller.router)
     app.include_router(change_history_controller.router)
+    app.include_router(job_controller.router)
 
     return app
 
@@ -104,8 +113,13 @@ async def internal_exception_handler(
 @app.on_event("startup")
 async def startup() -> None:
     await app.container.database().connect()
+    await app.container.history_writer().start()
+    await app.container.change_notification_service().start()
 
 
 @app.on_event("shutdown")
 async def shutdown() -> None:
+    await app.container.background_jobs().stop()
+    await app.container.change_notification_service().stop()
+    await app.container.history_writer().stop()
     await app.container.database().disconnect()
@@ -9,7 +9,10 @@ from alembic import context
 
 sys.path.append(os.getcwd())
 
-from models import applications, environments, variables, change_history
+from models import (
+    applications, environments, variables, change_history,
+    configuration_snapshots, configuration_checkpoints
+)
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -27,7 +30,9 @@ target_metadata = [
     applications.metadata,
     environments.metadata,
     variables.metadata,
-    change_history.metadata
+    change_history.metadata,
+    configuration_snapshots.metadata,
+    configuration_checkpoints.metadata
 ]
 
 # other values from the config, defined by the needs of env.py,
@@ -0,0 +1,51 @@
+"""17_10_2026 migration_9
+
+Revision ID: 2d7f3b9e6a15
+Revises: f4a8c2e7b913
+Create Date: 2026-10-17 19:12:37.840216
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d7f3b9e6a15'
+down_revision = 'f4a8c2e7b913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Lists are ordered by (created_at, id) newest first, so pages
+    # after a cursor are read by a backward scan of these indexes
+    op.create_index(
+        'ix_applications_created_at_id',
+        'applications',
+        ['created_at', 'id'],
+        postgresql_where=sa.text('is_deleted = false')
+    )
+    op.create_index(
+        'ix_environments_app_id_created_at_id',
+        'environments',
+        ['app_id', 'created_at', 'id'],
+        postgresql_where=sa.text('is_deleted = false')
+    )
+    op.create_index(
+        'ix_variables_env_id_created_at_id',
+        'variables',
+        ['env_id', 'created_at', 'id'],
+        postgresql_where=sa.text('is_deleted = false')
+    )
+    op.create_index(
+        'ix_change_history_entity_created_at_id',
+        'change_history',
+        ['entity_type', 'entity_id', 'created_at', 'id']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_change_history_entity_created_at_id', table_name='change_history')
+    op.drop_index('ix_variables_env_id_created_at_id', table_name='variables')
+    op.drop_index('ix_environments_app_id_created_at_id', table_name='environments')
+    op.drop_index('ix_applications_created_at_id', table_name='applications')
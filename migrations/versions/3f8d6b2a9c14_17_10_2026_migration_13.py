@@ -0,0 +1,43 @@
+"""17_10_2026 migration_13
+
+Revision ID: 3f8d6b2a9c14
+Revises: 9e4c1a7b3f52
+Create Date: 2026-10-17 23:48:21.094561
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8d6b2a9c14'
+down_revision = '9e4c1a7b3f52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm;')
+    # Trigram indexes serve prefix, substring and exact search
+    # of variables across all environments
+    op.create_index(
+        'ix_variables_name_trgm',
+        'variables',
+        ['name'],
+        postgresql_using='gin',
+        postgresql_ops={'name': 'gin_trgm_ops'},
+        postgresql_where=sa.text('is_deleted = false')
+    )
+    op.create_index(
+        'ix_variables_value_trgm',
+        'variables',
+        ['value'],
+        postgresql_using='gin',
+        postgresql_ops={'value': 'gin_trgm_ops'},
+        postgresql_where=sa.text('is_deleted = false')
+    )
+
+
+def downgrade():
+    op.drop_index('ix_variables_value_trgm', table_name='variables')
+    op.drop_index('ix_variables_name_trgm', table_name='variables')
@@ -0,0 +1,44 @@
+"""17_10_2026 migration_4
+
+Revision ID: 5f2d8c41a7e3
+Revises: b4c0ded6354e
+Create Date: 2026-10-17 10:12:31.418204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f2d8c41a7e3'
+down_revision = 'b4c0ded6354e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Variables triggers update their environment, so a single trigger
+    # on environments notifies about both variable and environment changes
+    op.execute(
+        '''
+            CREATE OR REPLACE FUNCTION notify_environment_changes()
+            RETURNS TRIGGER AS $$
+            BEGIN
+                PERFORM pg_notify('environment_changes', replace(NEW."code"::text, '-', ''));
+                RETURN NULL;
+            END;
+            $$ language 'plpgsql';
+
+            DROP TRIGGER IF EXISTS notify_environment_changes_on_update_trigger ON environments;
+            CREATE TRIGGER notify_environment_changes_on_update_trigger AFTER UPDATE ON environments FOR EACH ROW EXECUTE PROCEDURE notify_environment_changes();
+        '''
+    )
+
+
+def downgrade():
+    op.execute(
+        '''
+            DROP TRIGGER IF EXISTS notify_environment_changes_on_update_trigger ON environments;
+            DROP FUNCTION IF EXISTS notify_environment_changes();
+        '''
+    )
@@ -0,0 +1,124 @@
+"""17_10_2026 migration_11
+
+Revision ID: 6c3a9f1d8e27
+Revises: 8b1e4d7c2f60
+Create Date: 2026-10-17 21:36:52.408113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c3a9f1d8e27'
+down_revision = '8b1e4d7c2f60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        '''
+            ALTER TABLE change_history RENAME TO change_history_legacy;
+            ALTER TABLE change_history_legacy RENAME CONSTRAINT change_history_pkey TO change_history_legacy_pkey;
+            ALTER INDEX ix_change_history_entity_created_at_id RENAME TO ix_change_history_legacy_entity_created_at_id;
+            -- The sequence would be dropped together with the legacy table
+            ALTER SEQUENCE change_history_id_seq OWNED BY NONE;
+
+            CREATE TABLE change_history (
+                id integer NOT NULL DEFAULT nextval('change_history_id_seq'),
+                entity_type varchar(100) NOT NULL,
+                entity_id integer NOT NULL,
+                field varchar(100),
+                old_value varchar,
+                new_value varchar,
+                created_at timestamp NOT NULL,
+                -- Unique constraints of partitioned table must include partition key
+                CONSTRAINT change_history_pkey PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at);
+
+            ALTER SEQUENCE change_history_id_seq OWNED BY change_history.id;
+
+            -- Rows out of range of monthly partitions are kept until
+            -- partitions are created by scripts/maintain_change_history.py
+            CREATE TABLE change_history_default PARTITION OF change_history DEFAULT;
+
+            DO $$
+            DECLARE
+                period timestamp := date_trunc(
+                    'month',
+                    coalesce((SELECT min(created_at) FROM change_history_legacy), now())
+                );
+            BEGIN
+                WHILE period < date_trunc('month', now()) + interval '4 months' LOOP
+                    EXECUTE format(
+                        'CREATE TABLE %I PARTITION OF change_history FOR VALUES FROM (%L) TO (%L)',
+                        'change_history_p' || to_char(period, 'YYYY_MM'),
+                        period,
+                        period + interval '1 month'
+                    );
+                    period := period + interval '1 month';
+                END LOOP;
+            END
+            $$;
+
+            INSERT INTO change_history
+            SELECT id, entity_type, entity_id, field, old_value, new_value, created_at
+            FROM change_history_legacy;
+
+            DROP TABLE change_history_legacy;
+
+            -- History of entities moved out of partitions by retention,
+            -- values of the large changes column are compressed by TOAST
+            CREATE TABLE change_history_archive (
+                entity_type varchar(100) NOT NULL,
+                entity_id integer NOT NULL,
+                period date NOT NULL,
+                changes jsonb NOT NULL,
+                PRIMARY KEY (entity_type, entity_id, period)
+            );
+        '''
+    )
+    op.create_index(
+        'ix_change_history_entity_created_at_id',
+        'change_history',
+        ['entity_type', 'entity_id', 'created_at', 'id']
+    )
+
+
+def downgrade():
+    # Archived history is not restored
+    op.execute(
+        '''
+            DROP TABLE change_history_archive;
+
+            ALTER TABLE change_history RENAME TO change_history_partitioned;
+            ALTER TABLE change_history_partitioned RENAME CONSTRAINT change_history_pkey TO change_history_partitioned_pkey;
+            ALTER INDEX ix_change_history_entity_created_at_id RENAME TO ix_change_history_partitioned_entity_created_at_id;
+            ALTER SEQUENCE change_history_id_seq OWNED BY NONE;
+
+            CREATE TABLE change_history (
+                id integer NOT NULL DEFAULT nextval('change_history_id_seq'),
+                entity_type varchar(100) NOT NULL,
+                entity_id integer NOT NULL,
+                field varchar(100),
+                old_value varchar,
+                new_value varchar,
+                created_at timestamp NOT NULL,
+                CONSTRAINT change_history_pkey PRIMARY KEY (id)
+            );
+
+            ALTER SEQUENCE change_history_id_seq OWNED BY change_history.id;
+
+            INSERT INTO change_history
+            SELECT id, entity_type, entity_id, field, old_value, new_value, created_at
+            FROM change_history_partitioned;
+
+            DROP TABLE change_history_partitioned;
+        '''
+    )
+    op.create_index(
+        'ix_change_history_entity_created_at_id',
+        'change_history',
+        ['entity_type', 'entity_id', 'created_at', 'id']
+    )
@@ -0,0 +1,38 @@
+"""17_10_2026 migration_14
+
+Revision ID: 7a2e5c9d4b81
+Revises: 3f8d6b2a9c14
+Create Date: 2026-10-18 00:21:47.305812
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a2e5c9d4b81'
+down_revision = '3f8d6b2a9c14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Trigram indexes serve equality only since PostgreSQL 14,
+    # exact search is served by btree indexes on any version
+    op.create_index(
+        'ix_variables_name',
+        'variables',
+        ['name'],
+        postgresql_where=sa.text('is_deleted = false')
+    )
+    op.create_index(
+        'ix_variables_value_md5',
+        'variables',
+        [sa.text('md5(value)')],
+        postgresql_where=sa.text('is_deleted = false')
+    )
+
+
+def downgrade():
+    op.drop_index('ix_variables_value_md5', table_name='variables')
+    op.drop_index('ix_variables_name', table_name='variables')
@@ -0,0 +1,41 @@
+"""17_10_2026 migration_10
+
+Revision ID: 8b1e4d7c2f60
+Revises: 2d7f3b9e6a15
+Create Date: 2026-10-17 20:41:05.172934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b1e4d7c2f60'
+down_revision = '2d7f3b9e6a15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Deletion in batches and export read not deleted rows by identifier
+    op.create_index(
+        'ix_environments_app_id_id',
+        'environments',
+        ['app_id', 'id'],
+        postgresql_where=sa.text('is_deleted = false')
+    )
+    op.create_index(
+        'ix_variables_env_id_id',
+        'variables',
+        ['env_id', 'id'],
+        postgresql_where=sa.text('is_deleted = false')
+    )
+    # History is always filtered by entity type and identifier,
+    # which ix_change_history_entity_created_at_id covers
+    op.drop_index('ix_change_history_entity_id', table_name='change_history')
+
+
+def downgrade():
+    op.create_index('ix_change_history_entity_id', 'change_history', ['entity_id'], unique=False)
+    op.drop_index('ix_variables_env_id_id', table_name='variables')
+    op.drop_index('ix_environments_app_id_id', table_name='environments')
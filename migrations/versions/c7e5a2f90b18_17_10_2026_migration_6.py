@@ -0,0 +1,61 @@
+"""17_10_2026 migration_6
+
+Revision ID: c7e5a2f90b18
+Revises: a31e6b9c0d57
+Create Date: 2026-10-17 15:06:48.225370
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e5a2f90b18'
+down_revision = 'a31e6b9c0d57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows get version 1, so that a client syncing
+    # from version 0 receives all of them
+    op.add_column('environments', sa.Column('config_version', sa.BigInteger(), server_default=sa.text('1'), nullable=False))
+    op.add_column('variables', sa.Column('config_version', sa.BigInteger(), server_default=sa.text('1'), nullable=False))
+    op.alter_column('environments', 'config_version', server_default=sa.text('0'))
+    op.alter_column('variables', 'config_version', server_default=sa.text('0'))
+    op.create_index('ix_variables_env_id_config_version', 'variables', ['env_id', 'config_version'], unique=False)
+
+    # Variable takes the next version of its environment, the update
+    # locks environment row, so versions are assigned in commit order
+    # and a client never misses a change committed later with lower version
+    op.execute(
+        '''
+            CREATE OR REPLACE FUNCTION update_environment_updated_at_time()
+            RETURNS TRIGGER AS $$
+            BEGIN
+                UPDATE environments
+                SET updated_at = now(), config_version = config_version + 1
+                WHERE id = NEW."env_id"
+                RETURNING config_version INTO NEW."config_version";
+                RETURN NEW;
+            END;
+            $$ language 'plpgsql';
+        '''
+    )
+
+
+def downgrade():
+    op.execute(
+        '''
+            CREATE OR REPLACE FUNCTION update_environment_updated_at_time()
+            RETURNS TRIGGER AS $$
+            BEGIN
+                UPDATE environments SET updated_at = now() WHERE id = NEW."env_id";
+                RETURN NEW;
+            END;
+            $$ language 'plpgsql';
+        '''
+    )
+    op.drop_index('ix_variables_env_id_config_version', table_name='variables')
+    op.drop_column('variables', 'config_version')
+    op.drop_column('environments', 'config_version')
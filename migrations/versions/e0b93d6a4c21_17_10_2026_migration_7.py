@@ -0,0 +1,62 @@
+"""17_10_2026 migration_7
+
+Revision ID: e0b93d6a4c21
+Revises: c7e5a2f90b18
+Create Date: 2026-10-17 16:21:09.517733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e0b93d6a4c21'
+down_revision = 'c7e5a2f90b18'
+branch_labels = None
+depends_on = None
+
+
+# Number of conflicting names listed in the error
+MAX_LISTED_DUPLICATES = 50
+
+
+def upgrade():
+    # Duplicates are user data, so they are left to an operator to resolve,
+    # e.g. by deleting or renaming all but one variable of every name
+    duplicates = op.get_bind().execute(
+        sa.text(
+            '''
+                SELECT env_id, name, count(*) AS count
+                FROM variables
+                WHERE is_deleted = false
+                GROUP BY env_id, name
+                HAVING count(*) > 1
+                ORDER BY env_id, name
+            '''
+        )
+    ).fetchall()
+
+    if duplicates:
+        listed = '\n'.join(
+            f'    env_id={env_id} name={name!r} variables={count}'
+            for env_id, name, count in duplicates[:MAX_LISTED_DUPLICATES]
+        )
+        more = len(duplicates) - MAX_LISTED_DUPLICATES
+
+        raise RuntimeError(
+            f'{len(duplicates)} names are used by more than one not deleted variable '
+            f'of the same environment, resolve them before upgrading:\n{listed}'
+            + (f'\n    ... and {more} more' if more > 0 else '')
+        )
+
+    op.create_index(
+        'ux_variables_env_id_name',
+        'variables',
+        ['env_id', 'name'],
+        unique=True,
+        postgresql_where=sa.text('is_deleted = false')
+    )
+
+
+def downgrade():
+    op.drop_index('ux_variables_env_id_name', table_name='variables')
@@ -0,0 +1,84 @@
+"""17_10_2026 migration_8
+
+Revision ID: f4a8c2e7b913
+Revises: e0b93d6a4c21
+Create Date: 2026-10-17 18:02:44.306151
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a8c2e7b913'
+down_revision = 'e0b93d6a4c21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Configuration version of environment is advanced by the service layer
+    # once per write statement, so variables triggers are dropped, and
+    # applications are touched once per statement on environments
+    op.execute(
+        '''
+            DROP TRIGGER IF EXISTS update_environment_updated_at_time_on_update_trigger ON variables;
+            DROP TRIGGER IF EXISTS update_environment_updated_at_time_on_create_trigger ON variables;
+            DROP FUNCTION IF EXISTS update_environment_updated_at_time();
+
+            DROP TRIGGER IF EXISTS update_application_updated_at_time_on_update_trigger ON environments;
+            DROP TRIGGER IF EXISTS update_application_updated_at_time_on_create_trigger ON environments;
+
+            CREATE OR REPLACE FUNCTION update_application_updated_at_time()
+            RETURNS TRIGGER AS $$
+            BEGIN
+                -- Lock applications in a stable order to avoid deadlocks
+                PERFORM 1 FROM applications
+                WHERE id IN (SELECT app_id FROM changed_environments)
+                ORDER BY id
+                FOR UPDATE;
+
+                UPDATE applications SET updated_at = now()
+                WHERE id IN (SELECT app_id FROM changed_environments);
+                RETURN NULL;
+            END;
+            $$ language 'plpgsql';
+
+            CREATE TRIGGER update_application_updated_at_time_on_update_trigger AFTER UPDATE ON environments REFERENCING NEW TABLE AS changed_environments FOR EACH STATEMENT EXECUTE PROCEDURE update_application_updated_at_time();
+            CREATE TRIGGER update_application_updated_at_time_on_create_trigger AFTER INSERT ON environments REFERENCING NEW TABLE AS changed_environments FOR EACH STATEMENT EXECUTE PROCEDURE update_application_updated_at_time();
+        '''
+    )
+
+
+def downgrade():
+    op.execute(
+        '''
+            DROP TRIGGER IF EXISTS update_application_updated_at_time_on_update_trigger ON environments;
+            DROP TRIGGER IF EXISTS update_application_updated_at_time_on_create_trigger ON environments;
+
+            CREATE OR REPLACE FUNCTION update_application_updated_at_time()
+            RETURNS TRIGGER AS $$
+            BEGIN
+                UPDATE applications SET updated_at = now() WHERE id = NEW."app_id";
+                RETURN NEW;
+            END;
+            $$ language 'plpgsql';
+
+            CREATE TRIGGER update_application_updated_at_time_on_update_trigger BEFORE UPDATE ON environments FOR EACH ROW EXECUTE PROCEDURE update_application_updated_at_time();
+            CREATE TRIGGER update_application_updated_at_time_on_create_trigger BEFORE INSERT ON environments FOR EACH ROW EXECUTE PROCEDURE update_application_updated_at_time();
+
+            CREATE OR REPLACE FUNCTION update_environment_updated_at_time()
+            RETURNS TRIGGER AS $$
+            BEGIN
+                UPDATE environments
+                SET updated_at = now(), config_version = config_version + 1
+                WHERE id = NEW."env_id"
+                RETURNING config_version INTO NEW."config_version";
+                RETURN NEW;
+            END;
+            $$ language 'plpgsql';
+
+            CREATE TRIGGER update_environment_updated_at_time_on_update_trigger BEFORE UPDATE ON variables FOR EACH ROW EXECUTE PROCEDURE update_environment_updated_at_time();
+            CREATE TRIGGER update_environment_updated_at_time_on_create_trigger BEFORE INSERT ON variables FOR EACH ROW EXECUTE PROCEDURE update_environment_updated_at_time();
+        '''
+    )
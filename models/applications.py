@@ -15,5 +15,11 @@ applications_table = sqlalchemy.Table(
     ),
     sqlalchemy.Column("created_at", sqlalchemy.DateTime(), nullable=False),
     sqlalchemy.Column("updated_at", sqlalchemy.DateTime()),
-    sqlalchemy.Column("deleted_at", sqlalchemy.DateTime())
+    sqlalchemy.Column("deleted_at", sqlalchemy.DateTime()),
+    sqlalchemy.Index(
+        "ix_applications_created_at_id",
+        "created_at",
+        "id",
+        postgresql_where=sqlalchemy.text("is_deleted = false")
+    )
 )
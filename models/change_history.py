@@ -1,6 +1,7 @@
 import enum
 
 import sqlalchemy
+from sqlalchemy.dialects.postgresql import JSONB
 
 
 metadata = sqlalchemy.MetaData()
@@ -9,9 +10,25 @@ change_history_table = sqlalchemy.Table(
     "change_history", metadata,
     sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
     sqlalchemy.Column("entity_type", sqlalchemy.String(100), nullable=False),
-    sqlalchemy.Column("entity_id", sqlalchemy.Integer, index=True, nullable=False),
+    sqlalchemy.Column("entity_id", sqlalchemy.Integer, nullable=False),
     sqlalchemy.Column("field", sqlalchemy.String(100)),
     sqlalchemy.Column("old_value", sqlalchemy.String()),
     sqlalchemy.Column("new_value", sqlalchemy.String()),
-    sqlalchemy.Column("created_at", sqlalchemy.DateTime(), nullable=False)
+    sqlalchemy.Column("created_at", sqlalchemy.DateTime(), primary_key=True, nullable=False),
+    sqlalchemy.Index(
+        "ix_change_history_entity_created_at_id",
+        "entity_type",
+        "entity_id",
+        "created_at",
+        "id"
+    ),
+    postgresql_partition_by="RANGE (created_at)"
+)
+
+change_history_archive_table = sqlalchemy.Table(
+    "change_history_archive", metadata,
+    sqlalchemy.Column("entity_type", sqlalchemy.String(100), primary_key=True),
+    sqlalchemy.Column("entity_id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("period", sqlalchemy.Date(), primary_key=True),
+    sqlalchemy.Column("changes", JSONB(), nullable=False)
 )
@@ -0,0 +1,20 @@
+import sqlalchemy
+from sqlalchemy.dialects.postgresql import JSONB
+
+from .environments import environments_table
+
+metadata = sqlalchemy.MetaData()
+
+configuration_checkpoints_table = sqlalchemy.Table(
+    "configuration_checkpoints", metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column(
+        "env_id",
+        sqlalchemy.ForeignKey(environments_table.c.id, ondelete="CASCADE"),
+        nullable=False
+    ),
+    sqlalchemy.Column("taken_at", sqlalchemy.DateTime(), nullable=False),
+    sqlalchemy.Column("horizon", sqlalchemy.DateTime(), nullable=False),
+    sqlalchemy.Column("document", JSONB(), nullable=False),
+    sqlalchemy.Index("ix_configuration_checkpoints_env_id_taken_at", "env_id", "taken_at")
+)
@@ -0,0 +1,19 @@
+import sqlalchemy
+from sqlalchemy.dialects.postgresql import UUID
+
+from .environments import environments_table
+
+metadata = sqlalchemy.MetaData()
+
+configuration_snapshots_table = sqlalchemy.Table(
+    "configuration_snapshots", metadata,
+    sqlalchemy.Column("code", UUID(as_uuid=False), primary_key=True),
+    sqlalchemy.Column(
+        "env_id",
+        sqlalchemy.ForeignKey(environments_table.c.id, ondelete="CASCADE"),
+        unique=True,
+        nullable=False
+    ),
+    sqlalchemy.Column("version", sqlalchemy.DateTime(), nullable=False),
+    sqlalchemy.Column("document", sqlalchemy.LargeBinary(), nullable=False)
+)
@@ -27,5 +27,24 @@ environments_table = sqlalchemy.Table(
     ),
     sqlalchemy.Column("created_at", sqlalchemy.DateTime(), nullable=False),
     sqlalchemy.Column("updated_at", sqlalchemy.DateTime()),
-    sqlalchemy.Column("deleted_at", sqlalchemy.DateTime())
+    sqlalchemy.Column("deleted_at", sqlalchemy.DateTime()),
+    sqlalchemy.Column(
+        "config_version",
+        sqlalchemy.BigInteger(),
+        server_default=sqlalchemy.text("0"),
+        nullable=False
+    ),
+    sqlalchemy.Index(
+        "ix_environments_app_id_created_at_id",
+        "app_id",
+        "created_at",
+        "id",
+        postgresql_where=sqlalchemy.text("is_deleted = false")
+    ),
+    sqlalchemy.Index(
+        "ix_environments_app_id_id",
+        "app_id",
+        "id",
+        postgresql_where=sqlalchemy.text("is_deleted = false")
+    )
 )
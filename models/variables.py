@@ -18,5 +18,58 @@ variables_table = sqlalchemy.Table(
     sqlalchemy.Column("env_id", sqlalchemy.ForeignKey(environments_table.c.id, ondelete="CASCADE"), index=True),
     sqlalchemy.Column("created_at", sqlalchemy.DateTime(), nullable=False),
     sqlalchemy.Column("updated_at", sqlalchemy.DateTime()),
-    sqlalchemy.Column("deleted_at", sqlalchemy.DateTime())
+    sqlalchemy.Column("deleted_at", sqlalchemy.DateTime()),
+    sqlalchemy.Column(
+        "config_version",
+        sqlalchemy.BigInteger(),
+        server_default=sqlalchemy.text("0"),
+        nullable=False
+    ),
+    sqlalchemy.Index("ix_variables_env_id_config_version", "env_id", "config_version"),
+    sqlalchemy.Index(
+        "ix_variables_env_id_created_at_id",
+        "env_id",
+        "created_at",
+        "id",
+        postgresql_where=sqlalchemy.text("is_deleted = false")
+    ),
+    sqlalchemy.Index(
+        "ix_variables_env_id_id",
+        "env_id",
+        "id",
+        postgresql_where=sqlalchemy.text("is_deleted = false")
+    ),
+    sqlalchemy.Index(
+        "ix_variables_name",
+        "name",
+        postgresql_where=sqlalchemy.text("is_deleted = false")
+    ),
+    sqlalchemy.Index(
+        "ix_variables_name_trgm",
+        "name",
+        postgresql_using="gin",
+        postgresql_ops={"name": "gin_trgm_ops"},
+        postgresql_where=sqlalchemy.text("is_deleted = false")
+    ),
+    sqlalchemy.Index(
+        "ix_variables_value_trgm",
+        "value",
+        postgresql_using="gin",
+        postgresql_ops={"value": "gin_trgm_ops"},
+        postgresql_where=sqlalchemy.text("is_deleted = false")
+    ),
+    sqlalchemy.Index(
+        "ux_variables_env_id_name",
+        "env_id",
+        "name",
+        unique=True,
+        postgresql_where=sqlalchemy.text("is_deleted = false")
+    )
+)
+
+# Exact search by value, values are too long for a plain btree index
+sqlalchemy.Index(
+    "ix_variables_value_md5",
+    sqlalchemy.func.md5(variables_table.c.value),
+    postgresql_where=sqlalchemy.text("is_deleted = false")
 )
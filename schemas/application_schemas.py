@@ -29,5 +29,16 @@ class ApplicationsListSchema(BaseModel):
     
     """
 
-    total_count: int = Field(..., description="Total count of applications")
+    total_count: Optional[int] = Field(None, description="Total count of applications, missing if it is not requested")
     data: List[ApplicationSchema] = Field(..., description="List of applications")
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page, missing on the last page")
+
+
+class ApplicationImportResultSchema(BaseModel):
+    """Returns result of application import
+    
+    """
+
+    id: int = Field(..., description="Identifier of created application")
+    environments: int = Field(..., description="Number of imported environments")
+    variables: int = Field(..., description="Number of imported variables")
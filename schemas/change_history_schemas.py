@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -25,5 +25,22 @@ class ChangeHistoryListSchema(BaseModel):
     
     """
 
-    total_count: int = Field(..., description="Total count of change history entities")
+    total_count: Optional[int] = Field(None, description="Total count of change history entities, missing if it is not requested")
     data: List[ChangeHistorySchema] = Field(..., description="List of change history entities")
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page, missing on the last page")
+
+
+class ChangeHistoryWriterStatsSchema(BaseModel):
+    """Returns counters of change history writer
+
+    """
+
+    mode: str = Field(..., description="Mode of writing change history")
+    queue_depth: int = Field(..., description="Number of queued rows")
+    queue_size: int = Field(..., description="Maximum number of queued rows")
+    enqueued: int = Field(..., description="Number of rows put to the queue")
+    written: int = Field(..., description="Number of written rows")
+    dropped: int = Field(..., description="Number of rows dropped after failed writes")
+    flushes: int = Field(..., description="Number of successful inserts")
+    last_flush_latency: float = Field(..., description="Duration of the last insert in seconds")
+    max_flush_latency: float = Field(..., description="Maximum duration of insert in seconds")
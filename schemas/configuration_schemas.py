@@ -13,3 +13,38 @@ class ConfigurationSchema(BaseModel):
 
     environment_name: str = Field(..., description="Environment name")
     variables: List[VariableSchema] = Field(..., description="List of environment variables")
+
+
+class ConfigurationChangesSchema(BaseModel):
+    """Returns variables changed since a configuration version
+    
+    """
+
+    version: int = Field(..., description="Current configuration version")
+    variables: List[VariableSchema] = Field(..., description="Created, updated or deleted variables")
+
+
+class ConfigurationsBulkRequestSchema(BaseModel):
+    """Validates a request to get configurations of many environments
+    
+    """
+
+    codes: List[str] = Field(..., max_items=1000, description="Unique codes of environments")
+
+
+class ConfigurationCacheStatsSchema(BaseModel):
+    """Returns counters of configuration cache
+    
+    """
+
+    size: int = Field(..., description="Number of cached configurations")
+    max_size: int = Field(..., description="Maximum number of cached configurations")
+    hits: int = Field(..., description="Number of reads served from cache")
+    misses: int = Field(..., description="Number of reads served from database")
+    evictions: int = Field(..., description="Number of entries evicted by size or TTL")
+    invalidations: int = Field(..., description="Number of entries evicted by writes")
+    in_flight: int = Field(..., description="Number of loads from database in progress")
+    calls: int = Field(..., description="Number of loads from database")
+    coalesced: int = Field(..., description="Number of reads which joined a load in progress")
+    compressions: int = Field(..., description="Number of compressed responses")
+    compressed_hits: int = Field(..., description="Number of responses served with cached compressed content")
@@ -43,10 +43,20 @@ class EnvironmentUpdateSchema(BaseModel):
     description: Optional[str] = Field(None, description="Environment description")
 
 
+class EnvironmentCloneSchema(BaseModel):
+    """Validates a request to clone an environment
+
+    """
+
+    name: str = Field(..., description="Name of the new environment")
+    description: Optional[str] = Field(None, description="Description of the new environment, copied if omitted")
+
+
 class EnvironmentsListSchema(BaseModel):
     """Returns list of environments with total count
     
     """
 
-    total_count: int = Field(..., description="Total count of environments for application")
+    total_count: Optional[int] = Field(None, description="Total count of environments for application, missing if it is not requested")
     data: List[EnvironmentSchema] = Field(..., description="List of environments")
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page, missing on the last page")
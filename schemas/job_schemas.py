@@ -0,0 +1,19 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class JobSchema(BaseModel):
+    """Returns state of background job
+    
+    """
+
+    id: str = Field(..., description="Job identifier")
+    name: str = Field(..., description="Job name")
+    status: str = Field(..., description="One of running, completed, failed or cancelled")
+    done: int = Field(..., description="Number of processed items")
+    total: Optional[int] = Field(None, description="Number of items to process, unknown until job starts")
+    error: Optional[str] = Field(None, description="Reason of failure")
+    created_at: datetime = Field(..., description="Start date")
+    finished_at: Optional[datetime] = Field(None, description="Finish date")
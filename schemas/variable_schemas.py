@@ -39,5 +39,57 @@ class VariablesListSchema(BaseModel):
     
     """
 
-    total_count: int = Field(..., description="Total count of variables for environment")
+    total_count: Optional[int] = Field(None, description="Total count of variables for environment, missing if it is not requested")
     data: List[VariableSchema] = Field(..., description="List of variables")
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page, missing on the last page")
+
+
+class VariableSearchResultSchema(VariableSchema):
+    """Returns variable found by search with names
+    of its environment and application
+
+    """
+
+    env_id: int = Field(..., description="Identifier of environment that owns this variable")
+    environment_name: str = Field(..., description="Environment name")
+    app_id: int = Field(..., description="Identifier of application that owns the environment")
+    application_name: str = Field(..., description="Application name")
+
+
+class VariablesSearchSchema(BaseModel):
+    """Returns page of variables found by search
+    
+    """
+
+    data: List[VariableSearchResultSchema] = Field(..., description="List of found variables")
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page, missing on the last page")
+
+
+class VariablesBulkUpsertSchema(BaseModel):
+    """Validates a request to create or update many variables,
+    existing variables are matched by environment and name
+
+    """
+
+    variables: List[VariableCreateSchema] = Field(..., max_items=1000, description="Variables to create or update")
+
+
+class VariableBulkResultSchema(BaseModel):
+    """Returns result of creating or updating one variable
+    
+    """
+
+    env_id: int = Field(..., description="Identifier of environment that owns this variable")
+    name: str = Field(..., description="Variable name")
+    status: str = Field(..., description="One of created, updated, unchanged or failed")
+    id: Optional[int] = Field(None, description="Variable identifier")
+    error: Optional[str] = Field(None, description="Reason of failure")
+
+
+class VariablesBulkResultSchema(BaseModel):
+    """Returns results of creating or updating many variables
+    in the order of request
+    
+    """
+
+    data: List[VariableBulkResultSchema] = Field(..., description="List of results")
@@ -0,0 +1,146 @@
+"""Benchmark of concurrent variable writes into one environment
+
+Runs concurrent writers, each of them upserts batches of variables
+into the same environment by `VariableService.bulk_upsert`, and reports
+throughput, updates of parent environment row and lock contention
+sampled from `pg_stat_activity`.
+
+Writers of one environment always take turns on its row lock, which
+keeps versions in commit order. Per-row triggers of migration
+`b4c0ded6354e` also update the environment row for every written
+variable, so every turn is as long as a batch of row updates; since
+migration `f4a8c2e7b913` the version is advanced once per statement
+by the services instead.
+
+To compare, the per-row triggers have to be benchmarked with the service
+code of their own revision, otherwise every write advances the version
+both in the triggers and in the services. The script imports services
+from the working directory, so run this copy of it from a worktree
+checked out before migration `f4a8c2e7b913`:
+
+    git worktree add ../before "$(git log -1 --format=%H -- migrations/versions/f4a8c2e7b913_*.py)^"
+    cd ../before
+    alembic downgrade e0b93d6a4c21
+    python ../<project>/scripts/benchmark_concurrent_writes.py
+    cd ../<project>
+    alembic upgrade head
+    python scripts/benchmark_concurrent_writes.py
+
+Usage (from the project root):
+
+    python scripts/benchmark_concurrent_writes.py --writers 16 --batches 20 --batch-size 200
+
+"""
+import argparse
+import asyncio
+import contextvars
+import os
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+from containers import Container
+from schemas.application_schemas import ApplicationCreateSchema
+from schemas.environment_schemas import EnvironmentCreateSchema
+from schemas.variable_schemas import VariableCreateSchema
+
+
+PARENT_UPDATES = '''
+    SELECT n_tup_upd FROM pg_stat_user_tables WHERE relname = 'environments'
+'''
+
+LOCK_WAITS = '''
+    SELECT count(*) FROM pg_stat_activity
+    WHERE datname = current_database() AND wait_event_type = 'Lock'
+'''
+
+
+def start_task(coroutine) -> asyncio.Task:
+    """Starts a task with an empty context, so that it does not share
+    connection of the current task, which `databases` keeps
+    in a context variable
+
+    """
+
+    return contextvars.Context().run(asyncio.ensure_future, coroutine)
+
+
+async def sample_lock_waits(database, samples: list, stop: asyncio.Event) -> None:
+    async with database.connection() as connection:
+        while not stop.is_set():
+            samples.append(await connection.fetch_val(LOCK_WAITS))
+            await asyncio.sleep(0.005)
+
+
+async def parent_updates(database) -> int:
+    # Statistics are sent by backends with a delay
+    await asyncio.sleep(1)
+    await database.execute('SELECT pg_stat_clear_snapshot()')
+
+    return await database.fetch_val(PARENT_UPDATES)
+
+
+async def main(args) -> None:
+    container = Container()
+    container.config.from_yaml('config/config.yaml')
+    database = container.database()
+    await database.connect()
+    application = await container.app_service().create(
+        ApplicationCreateSchema(name='benchmark of concurrent writes')
+    )
+
+    try:
+        environment = await container.env_service().create(
+            EnvironmentCreateSchema(name='benchmark', app_id=application['id'])
+        )
+
+        async def writer(number: int) -> None:
+            var_service = container.var_service()
+
+            for batch in range(args.batches):
+                # Every other batch updates variables of the previous one
+                generation = batch - batch % 2
+                await var_service.bulk_upsert(
+                    [
+                        VariableCreateSchema(
+                            env_id=environment['id'],
+                            name=f'VAR_{number}_{generation}_{index}',
+                            value=f'{batch}'
+                        )
+                        for index in range(args.batch_size)
+                    ]
+                )
+
+        updates_before = await parent_updates(database)
+        samples = []
+        stop = asyncio.Event()
+        sampler = start_task(sample_lock_waits(database, samples, stop))
+        started_at = time.perf_counter()
+        await asyncio.gather(*(start_task(writer(number)) for number in range(args.writers)))
+        elapsed = time.perf_counter() - started_at
+        stop.set()
+        await sampler
+        updates_after = await parent_updates(database)
+
+        rows = args.writers * args.batches * args.batch_size
+        statements = args.writers * args.batches
+        print(
+            f"{rows} rows in {statements} statements: {elapsed:.2f} s, "
+            f"{rows / elapsed:.0f} rows/s\n"
+            f"environment row updates: {updates_after - updates_before} "
+            f"({(updates_after - updates_before) / statements:.1f} per statement)\n"
+            f"backends waiting for locks: avg {sum(samples) / max(len(samples), 1):.2f}, "
+            f"max {max(samples, default=0)}"
+        )
+    finally:
+        await container.app_service().delete(application['id'])
+        await database.disconnect()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--batches', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
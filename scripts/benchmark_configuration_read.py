@@ -0,0 +1,162 @@
+"""Benchmark of configuration read path
+
+Compares the two-query read path (`EnvironmentService.get_one_by_code`
+followed by `VariableService.get_list` and rendering through
+`ConfigurationSchema`) with `ConfigurationService.load_configuration`,
+which reads a pre-serialized snapshot by a single primary key lookup,
+bypassing the cache.
+
+Reports latency percentiles, number of connection pool checkouts
+and average pool occupancy (connections held per wall second).
+
+Usage (from the project root):
+
+    python scripts/benchmark_configuration_read.py --requests 5000 --concurrency 50
+
+"""
+import argparse
+import asyncio
+import contextvars
+import os
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+from sqlalchemy import select
+
+from containers import Container
+from models.environments import environments_table
+from schemas.configuration_schemas import ConfigurationSchema
+
+
+class PoolProbe:
+    """Counts pool checkouts and time connections are held
+
+    """
+
+    def __init__(self, pool) -> None:
+        self.checkouts = 0
+        self.held = 0.0
+        self._acquired_at = {}
+        self._acquire = pool.acquire
+        self._release = pool.release
+        pool.acquire = self.acquire
+        pool.release = self.release
+
+    def reset(self) -> None:
+        self.checkouts = 0
+        self.held = 0.0
+
+    async def acquire(self, *args, **kwargs):
+        connection = await self._acquire(*args, **kwargs)
+        self.checkouts += 1
+        self._acquired_at[id(connection)] = time.perf_counter()
+
+        return connection
+
+    async def release(self, connection, *args, **kwargs):
+        acquired_at = self._acquired_at.pop(id(connection), None)
+
+        if acquired_at is not None:
+            self.held += time.perf_counter() - acquired_at
+
+        return await self._release(connection, *args, **kwargs)
+
+
+def start_task(coroutine) -> asyncio.Task:
+    """Starts a task with an empty context, so that it does not share
+    connection of the current task, which `databases` keeps
+    in a context variable
+
+    """
+
+    return contextvars.Context().run(asyncio.ensure_future, coroutine)
+
+
+async def two_queries(container: Container, code: str) -> bytes:
+    environment = await container.env_service().get_one_by_code(code)
+    variables = await container.var_service().get_list(environment['id'])
+
+    return ConfigurationSchema(
+        environment_name=environment['name'],
+        variables=variables
+    ).json().encode()
+
+
+async def snapshot_lookup(container: Container, code: str) -> bytes:
+    configuration = await container.configuration_service().load_configuration(code)
+
+    return configuration['content']
+
+
+async def run(container, probe, read, codes, requests, concurrency) -> dict:
+    latencies = []
+    queue = asyncio.Queue()
+
+    for i in range(requests):
+        queue.put_nowait(codes[i % len(codes)])
+
+    async def worker() -> None:
+        while not queue.empty():
+            code = queue.get_nowait()
+            started_at = time.perf_counter()
+            await read(container, code)
+            latencies.append(time.perf_counter() - started_at)
+
+    probe.reset()
+    started_at = time.perf_counter()
+    await asyncio.gather(*(start_task(worker()) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+    latencies.sort()
+
+    def percentile(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    return {
+        'rps': requests / elapsed,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'checkouts': probe.checkouts,
+        'pool_occupancy': probe.held / elapsed
+    }
+
+
+async def main(args) -> None:
+    container = Container()
+    container.config.from_yaml('config/config.yaml')
+    database = container.database()
+    await database.connect()
+
+    try:
+        probe = PoolProbe(database._backend._pool)
+        query = (
+            select([environments_table.c.code])
+            .where(environments_table.c.is_deleted == False)
+            .limit(args.environments)
+        )
+        codes = [row['code'] for row in await database.fetch_all(query)]
+
+        if not codes:
+            raise SystemExit('No environments to benchmark, seed the database first')
+
+        for name, read in (('two queries', two_queries), ('snapshot lookup', snapshot_lookup)):
+            result = await run(container, probe, read, codes, args.requests, args.concurrency)
+            print(
+                f"{name:>16}: {result['rps']:8.1f} req/s  "
+                f"p50 {result['p50_ms']:6.2f} ms  p95 {result['p95_ms']:6.2f} ms  "
+                f"p99 {result['p99_ms']:6.2f} ms  "
+                f"checkouts {result['checkouts']}  "
+                f"pool occupancy {result['pool_occupancy']:.2f}"
+            )
+    finally:
+        await database.disconnect()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--environments', type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,51 @@
+"""Checkpoints of environment configurations
+
+Takes checkpoints of environments changed since their last checkpoint,
+which `/configurations?as_of=` rebuilds configurations from, and removes
+checkpoints older than `--keep-days`. Settings are read from `checkpoints`
+section of `config/config.yaml` unless overridden. Is safe to run
+repeatedly, e.g. hourly by cron, the more often it runs the less change
+history is replayed by point-in-time reads.
+
+The database role of the script has to see transactions of every role
+which writes configurations: run it by the same role as the application
+or grant `pg_read_all_stats` to its role.
+
+Usage (from the project root):
+
+    python scripts/create_configuration_checkpoints.py --keep-days 90
+
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.append(os.getcwd())
+
+from containers import Container
+
+
+async def main(args) -> None:
+    container = Container()
+    container.config.from_yaml('config/config.yaml')
+    database = container.database()
+    await database.connect()
+
+    try:
+        checkpoint_service = container.checkpoint_service()
+        created = await checkpoint_service.create()
+        print(f"created checkpoints: {created}")
+
+        keep_days = container.config.checkpoints.keep_days() if args.keep_days is None else args.keep_days
+
+        if keep_days:
+            await checkpoint_service.remove(keep_days)
+    finally:
+        await database.disconnect()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--keep-days', type=int, help='number of days to keep checkpoints, 0 keeps all of them')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,55 @@
+"""Maintenance of change history partitions
+
+Creates monthly partitions of `change_history` ahead and applies
+the retention policy to old ones, settings are read from
+`change_history` section of `config/config.yaml` unless overridden.
+Is safe to run repeatedly, e.g. daily by cron.
+
+Usage (from the project root):
+
+    python scripts/maintain_change_history.py --ahead 3 --keep 12 --action archive
+
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.append(os.getcwd())
+
+from containers import Container
+from services.change_history_service import RETENTION_ACTIONS
+
+
+async def main(args) -> None:
+    container = Container()
+    container.config.from_yaml('config/config.yaml')
+    config = container.config.change_history
+    database = container.database()
+    await database.connect()
+
+    try:
+        change_history_service = container.change_history_service()
+        created = await change_history_service.create_partitions(
+            config.partitions_ahead() if args.ahead is None else args.ahead
+        )
+        print(f"created partitions: {', '.join(created) or 'none'}")
+
+        keep = config.retention_months() if args.keep is None else args.keep
+
+        if keep:
+            removed = await change_history_service.apply_retention(
+                keep,
+                args.action or config.retention_action()
+            )
+            print(f"removed partitions: {', '.join(removed) or 'none'}")
+    finally:
+        await database.disconnect()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ahead', type=int, help='number of months to create partitions ahead')
+    parser.add_argument('--keep', type=int, help='number of whole months to keep, 0 keeps all of them')
+    parser.add_argument('--action', choices=RETENTION_ACTIONS)
+    asyncio.run(main(parser.parse_args()))
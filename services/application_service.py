@@ -1,13 +1,15 @@
-from datetime import datetime
-from typing import List
+from typing import Callable, List, Optional
 
 from databases import Database
 from databases.backends.postgres import Record
 from sqlalchemy import desc, func, select
 
+from helpers.pagination import estimated_total, exact_total, paginate
+from helpers.projection import select_columns
 from models.applications import applications_table
 from schemas.application_schemas import ApplicationCreateSchema
 from .base_service import BaseService
+from .change_history_writer import ChangeHistoryWriter
 from .environment_service import EnvironmentService
 
 
@@ -19,17 +21,23 @@ class ApplicationService(BaseService):
     def __init__(
         self,
         database: Database,
-        env_service: EnvironmentService
+        env_service: EnvironmentService,
+        history_writer: ChangeHistoryWriter
     ) -> None:
         """Construct a new :class: `ApplicationService`
 
         :param `database` - an instance of `databases.Database` 
         for asynchronous work with database
 
+        :param `history_writer` - an instance of
+        `services.ChangeHistoryWriter` which writes change history
+        of updated applications
+
         """
 
         self.database = database
         self.env_service = env_service
+        self.history_writer = history_writer
 
     async def create(
         self, 
@@ -51,7 +59,7 @@ class ApplicationService(BaseService):
                 .values(
                     name=data.name,
                     description=data.description,
-                    created_at=datetime.now()
+                    created_at=func.localtimestamp()
                 )
                 .returning(
                     applications_table.c.id,
@@ -72,6 +80,7 @@ class ApplicationService(BaseService):
         data: ApplicationCreateSchema
     ) -> Record:
         """Updates an application according to the passed data
+        and records change history of its fields
 
         :param `id` - identifier of application
 
@@ -83,16 +92,17 @@ class ApplicationService(BaseService):
 
         """
 
+        history = [] if self.history_writer.is_write_behind else None
+
         async with self.database.transaction():
-            query = (
-                applications_table.update()
-                .where(applications_table.c.id == id)
-                .values(
-                    name=data.name,
-                    description=data.description,
-                    updated_at=datetime.now()
-                )
-                .returning(
+            application = await self.update_with_history(
+                applications_table,
+                id,
+                {
+                    'name': data.name,
+                    'description': data.description
+                },
+                [
                     applications_table.c.id,
                     applications_table.c.name,
                     applications_table.c.description,
@@ -100,10 +110,14 @@ class ApplicationService(BaseService):
                     applications_table.c.updated_at,
                     applications_table.c.deleted_at,
                     applications_table.c.is_deleted
-                )
+                ],
+                history=history
             )
 
-            return await self.database.fetch_one(query)
+        if history:
+            await self.history_writer.enqueue(history)
+
+        return application
 
     async def delete(self, id: int) -> None:
         """Deletes an application according passed application identifier
@@ -118,12 +132,57 @@ class ApplicationService(BaseService):
                 .where(applications_table.c.id == id)
                 .values(
                     is_deleted=True,
-                    deleted_at=datetime.now()
+                    deleted_at=func.localtimestamp()
                 )
             )
             await self.database.execute(query)
             await self.env_service.delete_by_app_id(id)
 
+    async def delete_in_batches(
+        self,
+        id: int,
+        progress: Callable[[int, int], None],
+        batch_size: int = 100
+    ) -> None:
+        """Deletes an application at once and then its environments
+        and variables in batches, each in its own transaction,
+        so that locks are not held until the whole application is deleted,
+        interrupted deletion is continued by calling it again
+
+        :param `id` - identifier of application
+
+        :param `progress` - callback which accepts number of deleted
+        and total number of environments
+
+        :optional param `batch_size` - number of environments per batch
+
+        """
+
+        async with self.database.transaction():
+            # Continued deletion keeps the original deletion date
+            query = (
+                applications_table.update()
+                .where(applications_table.c.id == id)
+                .values(
+                    is_deleted=True,
+                    deleted_at=func.coalesce(applications_table.c.deleted_at, func.localtimestamp())
+                )
+            )
+            await self.database.execute(query)
+            total = await self.env_service.get_count(id)
+
+        done = 0
+        progress(done, total)
+
+        while done < total:
+            deleted = await self.env_service.delete_by_app_id(id, batch_size)
+
+            if not deleted:
+                break
+
+            done += deleted
+            progress(done, total)
+
     async def get_one(self, id: int) -> Record:
         """Selects application by its id from the database
 
@@ -155,7 +214,11 @@ class ApplicationService(BaseService):
     async def get_list(
         self,
         page: int,
-        per_page: int
+        per_page: int,
+        cursor: Optional[str] = None,
+        include_total: bool = False,
+        approximate_total: bool = False,
+        fields: Optional[List[str]] = None
     ) -> List[Record]:
         """Selects all applications from the database
 
@@ -163,30 +226,52 @@ class ApplicationService(BaseService):
 
         :param `per_page` - number of entities on one page
 
+        :optional param `cursor` - cursor of the previous page,
+        page number is ignored if it is passed
+
+        :optional param `include_total` - whether to select total number
+        of entities as `total_count` column of every row
+
+        :optional param `approximate_total` - whether total number
+        is estimated by planner statistics instead of being counted
+
+        :optional param `fields` - names of selected columns,
+        identifier and creation date are always selected
+
         :return list of `databases.backends.postgres.Record`
         which provide application data
 
+        :raise `helpers.pagination.InvalidCursorError` if cursor is malformed
+
+        :raise `helpers.projection.InvalidFieldsError` if some of fields
+        is not a column
+
         """
 
-        offset = (page - 1) * per_page
         query = (
             select(
-                [
-                    applications_table.c.id,
-                    applications_table.c.name,
-                    applications_table.c.description,
-                    applications_table.c.created_at,
-                    applications_table.c.updated_at,
-                    applications_table.c.deleted_at,
-                    applications_table.c.is_deleted
-                ]
+                select_columns(
+                    [
+                        applications_table.c.id,
+                        applications_table.c.name,
+                        applications_table.c.description,
+                        applications_table.c.created_at,
+                        applications_table.c.updated_at,
+                        applications_table.c.deleted_at,
+                        applications_table.c.is_deleted
+                    ],
+                    fields
+                )
             )
             .select_from(applications_table)
             .where(applications_table.c.is_deleted == False)
-            .order_by(desc(applications_table.c.created_at))
-            .limit(per_page)
-            .offset(offset)
         )
+        total = None
+
+        if include_total:
+            total = estimated_total('ix_applications_created_at_id') if approximate_total else exact_total()
+
+        query = paginate(query, applications_table, per_page, page, cursor, total)
 
         return await self.database.fetch_all(query)
 
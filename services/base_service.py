@@ -1,5 +1,8 @@
 from abc import abstractmethod, ABC
-from typing import List
+from typing import List, Optional
+
+from databases.backends.postgres import Record
+from sqlalchemy import Column, DateTime, Table, Text, column, text
 
 from schemas.base_schemas import BaseSchema
 
@@ -14,3 +17,116 @@ class BaseService(ABC):
 
     @abstractmethod
     async def delete(self, id: int) -> None: pass
+
+    async def update_with_history(
+        self,
+        table: Table,
+        id: int,
+        values: dict,
+        returning: List[Column],
+        extra_values: Optional[dict] = None,
+        history: Optional[List[dict]] = None
+    ) -> Record:
+        """Updates an entity and records change history for every
+        changed field in a single statement
+
+        Old values are read from the row locked by the same statement,
+        so concurrent updates produce consistent history, entity and
+        its history are stamped by the database transaction time
+
+        :param `table` - table of entity, its name is used
+        as entity type of change history
+
+        :param `id` - entity identifier
+
+        :param `values` - new values of updated fields
+
+        :param `returning` - columns of updated entity to return
+
+        :optional param `extra_values` - new values of updated fields
+        which are not recorded to history
+
+        :optional param `history` - list to which change history rows
+        are appended instead of being written by the statement,
+        so that caller is able to queue them after commit
+
+        :return an instance of `databases.backends.postgres.Record`
+        which provide entity data or `None` if entity does not exist
+
+        """
+
+        fields = list(values)
+        extra_values = extra_values or {}
+        columns = [column.name for column in returning]
+        updated_columns = columns + [
+            column for column in ['id', *fields] if column not in columns
+        ]
+
+        if history is None:
+            history_query = f'''
+                , history AS (
+                    INSERT INTO change_history (entity_id, entity_type, field, old_value, new_value, created_at)
+                    SELECT updated.id, :entity_type, changes.field, changes.old_value, changes.new_value, updated.changed_at
+                    FROM updated, LATERAL (
+                        VALUES {', '.join(f"('{field}', CAST(updated.old_{field} AS text), CAST(updated.{field} AS text))" for field in fields)}
+                    ) AS changes (field, old_value, new_value)
+                    WHERE changes.old_value IS DISTINCT FROM changes.new_value
+                )
+            '''
+            selected = columns
+            result_columns = returning
+        else:
+            history_query = ''
+            selected = columns + ['changed_at'] + [
+                f'CAST(old_{field} AS text) AS old_{field}' for field in fields
+            ] + [
+                f'CAST({field} AS text) AS new_{field}' for field in fields
+            ]
+            result_columns = returning + [column('changed_at', DateTime)] + [
+                column(f'{prefix}_{field}', Text)
+                for prefix in ['old', 'new'] for field in fields
+            ]
+
+        query = text(
+            f'''
+                WITH updated AS (
+                    UPDATE {table.name}
+                    SET {', '.join(f'{field} = :{field}' for field in [*fields, *extra_values])},
+                        updated_at = LOCALTIMESTAMP
+                    FROM (
+                        SELECT id, {', '.join(fields)}
+                        FROM {table.name}
+                        WHERE id = :id
+                        FOR UPDATE
+                    ) AS old
+                    WHERE {table.name}.id = old.id
+                    RETURNING
+                        {', '.join(f'{table.name}.{column}' for column in updated_columns)},
+                        {table.name}.updated_at AS changed_at,
+                        {', '.join(f'old.{field} AS old_{field}' for field in fields)}
+                ){history_query}
+                SELECT {', '.join(selected)} FROM updated
+            '''
+        ).bindparams(
+            id=id,
+            **({'entity_type': table.name} if history is None else {}),
+            **values,
+            **extra_values
+        ).columns(*result_columns)
+        record = await self.database.fetch_one(query)
+
+        if history is not None and record is not None:
+            for field in fields:
+                if record[f'old_{field}'] != record[f'new_{field}']:
+                    history.append(
+                        {
+                            'entity_id': id,
+                            'entity_type': table.name,
+                            'field': field,
+                            'old_value': record[f'old_{field}'],
+                            'new_value': record[f'new_{field}'],
+                            'created_at': record['changed_at']
+                        }
+                    )
+
+        return record
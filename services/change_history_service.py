@@ -1,17 +1,21 @@
-from datetime import datetime
-from typing import List
+import re
+from datetime import date
+from typing import List, Optional, Tuple
 
 from databases import Database
 from databases.backends.postgres import Record
-from sqlalchemy import desc, func, select, and_, Table
-from pydantic import BaseModel
+from sqlalchemy import desc, func, select, and_, Table, text
 
+from helpers.pagination import exact_total, paginate
+from helpers.projection import select_columns
 from models.change_history import change_history_table
 from schemas.base_schemas import BaseSchema
 from .base_service import BaseService
-from .application_service import ApplicationService
-from .environment_service import EnvironmentService
-from .variable_service import VariableService
+
+
+RETENTION_ACTIONS = ('archive', 'detach')
+
+PARTITION_NAME = re.compile(r'^change_history_p(\d{4})_(\d{2})$')
 
 
 class ChangeHistoryService(BaseService):
@@ -19,13 +23,7 @@ class ChangeHistoryService(BaseService):
 
     """
 
-    def __init__(
-        self,
-        database: Database,
-        app_service: ApplicationService,
-        env_service: EnvironmentService,
-        var_service: VariableService
-    ) -> None:
+    def __init__(self, database: Database) -> None:
         """Construct a new :class: `ChangeHistoryService`
 
         :param `database` - an instance of `databases.Database` 
@@ -34,53 +32,6 @@ class ChangeHistoryService(BaseService):
         """
 
         self.database = database
-        self.app_service = app_service
-        self.env_service = env_service
-        self.var_service = var_service
-
-    async def make_history(
-        self,
-        entity_id: int,
-        entity_type: str,
-        entity_new_data: BaseModel
-    ) -> None:
-        """Compares old and new entity data and create change history entity
-        for each difference
-
-        :param `entity_id` - entity id
-
-        :param `entity_type` - type of entity (applications, environments, variables)
-
-        :param `entity_new_data` - entity new data
-
-        """
-
-        if entity_type == 'applications':
-            entity_old_data = await self.app_service.get_one(entity_id)
-        elif entity_type == 'environments':
-            entity_old_data = await self.env_service.get_one(entity_id)
-        elif entity_type == 'variables':
-            entity_old_data = await self.var_service.get_one(entity_id)
-        else:
-            raise Exception('Unexpected entity type!')
-
-        update_date = datetime.now()
-
-        for key, old_value in entity_old_data.items():
-            if hasattr(entity_new_data, key):
-                new_value = getattr(entity_new_data, key)
-
-                if new_value != old_value:
-                    await self.create(
-                        {
-                            'entity_id': entity_id,
-                            'entity_type': entity_type,
-                            'field': key,
-                            'old_value': old_value,
-                            'new_value': new_value,
-                            'created_at': update_date
-                        }
-                    )
 
     async def create(
         self,
@@ -104,7 +55,10 @@ class ChangeHistoryService(BaseService):
         entity_type: str, 
         entity_id: int,
         page: int,
-        per_page: int
+        per_page: int,
+        cursor: Optional[str] = None,
+        include_total: bool = False,
+        fields: Optional[List[str]] = None
     ) -> List[Record]:
         """Selects change history for entity from the database
 
@@ -116,23 +70,39 @@ class ChangeHistoryService(BaseService):
 
         :param `per_page` - number of entities on one page
 
+        :optional param `cursor` - cursor of the previous page,
+        page number is ignored if it is passed
+
+        :optional param `include_total` - whether to select total number
+        of entities as `total_count` column of every row
+
+        :optional param `fields` - names of selected columns,
+        identifier and creation date are always selected
+
         :return list of `databases.backends.postgres.Record`
         which provide change history data for specific entity
 
+        :raise `helpers.pagination.InvalidCursorError` if cursor is malformed
+
+        :raise `helpers.projection.InvalidFieldsError` if some of fields
+        is not a column
+
         """
 
-        offset = (page - 1) * per_page
         query = (
             select(
-                [
-                    change_history_table.c.id,
-                    change_history_table.c.entity_type,
-                    change_history_table.c.entity_id,
-                    change_history_table.c.field,
-                    change_history_table.c.old_value,
-                    change_history_table.c.new_value,
-                    change_history_table.c.created_at
-                ]
+                select_columns(
+                    [
+                        change_history_table.c.id,
+                        change_history_table.c.entity_type,
+                        change_history_table.c.entity_id,
+                        change_history_table.c.field,
+                        change_history_table.c.old_value,
+                        change_history_table.c.new_value,
+                        change_history_table.c.created_at
+                    ],
+                    fields
+                )
             )
             .select_from(change_history_table)
             .where(
@@ -141,9 +111,14 @@ class ChangeHistoryService(BaseService):
                     change_history_table.c.entity_type == entity_type
                 )
             )
-            .order_by(desc(change_history_table.c.created_at))
-            .limit(per_page)
-            .offset(offset)
+        )
+        query = paginate(
+            query,
+            change_history_table,
+            per_page,
+            page,
+            cursor,
+            exact_total() if include_total else None
         )
 
         return await self.database.fetch_all(query)
@@ -176,8 +151,189 @@ class ChangeHistoryService(BaseService):
         
         return await self.database.fetch_val(query)
 
+    async def create_partitions(self, ahead: int) -> List[str]:
+        """Creates monthly partitions of change history for the current
+        month and months ahead, rows of their months which were written
+        to the default partition are moved to them
+
+        Months are counted by the database clock, which rows are stamped by.
+
+        :param `ahead` - number of months ahead of the current one
+
+        :return names of created partitions
+
+        """
+
+        existing = {name for name, _ in await self.get_partitions()}
+        created = []
+        period = await self._get_current_period()
+
+        for _ in range(ahead + 1):
+            name = _partition_name(period)
+
+            if name not in existing:
+                await self._create_partition(period)
+                created.append(name)
+
+            period = _add_months(period, 1)
+
+        return created
+
+    async def apply_retention(self, keep: int, action: str) -> List[str]:
+        """Removes monthly partitions older than retention period
+        from change history
+
+        Rows older than retention period which were written to the default
+        partition are moved to partitions of their months first, so they
+        are removed with the rest of their months.
+
+        :param `keep` - number of whole months before the current one
+        by the database clock which are kept
+
+        :param `action` - `archive` to move history of every entity
+        of partition to a row of compressed `change_history_archive`
+        table and drop the partition, `detach` to detach partition
+        and keep it as a standalone table
+
+        :return names of removed partitions
+
+        """
+
+        if action not in RETENTION_ACTIONS:
+            raise ValueError(f'Unknown retention action {action}')
+
+        cutoff = _add_months(await self._get_current_period(), -keep)
+        removed = []
+        existing = {name for name, _ in await self.get_partitions()}
+        query = text(
+            '''
+                SELECT DISTINCT CAST(date_trunc('month', created_at) AS date) AS period
+                FROM change_history_default
+                WHERE created_at < CAST(:cutoff AS date)
+            '''
+        ).bindparams(cutoff=cutoff)
+
+        for row in await self.database.fetch_all(query):
+            if _partition_name(row['period']) not in existing:
+                await self._create_partition(row['period'])
+
+        for name, period in await self.get_partitions():
+            if _add_months(period, 1) > cutoff:
+                continue
+
+            async with self.database.transaction():
+                if action == 'archive':
+                    await self.database.execute(
+                        text(
+                            f'''
+                                INSERT INTO change_history_archive (entity_type, entity_id, period, changes)
+                                SELECT
+                                    entity_type,
+                                    entity_id,
+                                    CAST(:period AS date),
+                                    jsonb_agg(
+                                        jsonb_build_object(
+                                            'id', id,
+                                            'field', field,
+                                            'old_value', old_value,
+                                            'new_value', new_value,
+                                            'created_at', created_at
+                                        ) ORDER BY created_at, id
+                                    )
+                                FROM {name}
+                                GROUP BY entity_type, entity_id
+                                ON CONFLICT (entity_type, entity_id, period)
+                                DO UPDATE SET changes = change_history_archive.changes || excluded.changes
+                            '''
+                        ).bindparams(period=period)
+                    )
+
+                await self.database.execute(text(f'ALTER TABLE change_history DETACH PARTITION {name}'))
+
+                if action == 'archive':
+                    await self.database.execute(text(f'DROP TABLE {name}'))
+
+            removed.append(name)
+
+        return removed
+
+    async def get_partitions(self) -> List[Tuple[str, date]]:
+        """Selects monthly partitions of change history
+
+        :return list of partition names and first days of their months
+        in chronological order
+
+        """
+
+        query = text(
+            '''
+                SELECT child.relname AS name
+                FROM pg_inherits
+                JOIN pg_class AS parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+                WHERE parent.relname = 'change_history'
+            '''
+        )
+        partitions = []
+
+        for row in await self.database.fetch_all(query):
+            match = PARTITION_NAME.match(row['name'])
+
+            if match is not None:
+                partitions.append((row['name'], date(int(match[1]), int(match[2]), 1)))
+
+        return sorted(partitions, key=lambda partition: partition[1])
+
+    async def _get_current_period(self) -> date:
+        """Selects the first day of the current month by the database clock
+
+        """
+
+        return (await self.database.fetch_val(select([func.current_date()]))).replace(day=1)
+
+    async def _create_partition(self, period: date) -> None:
+        """Creates partition of the month and moves rows
+        of that month from the default partition to it
+
+        """
+
+        name = _partition_name(period)
+        bounds = f"FROM ('{period}') TO ('{_add_months(period, 1)}')"
+
+        async with self.database.transaction():
+            # Table is attached after rows are moved, as a partition
+            # can not be created while the default one has its rows
+            await self.database.execute(
+                text(f'CREATE TABLE {name} (LIKE change_history INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+            )
+            await self.database.execute(
+                text(
+                    f'''
+                        WITH moved AS (
+                            DELETE FROM change_history_default
+                            WHERE created_at >= CAST(:start AS date) AND created_at < CAST(:end AS date)
+                            RETURNING *
+                        )
+                        INSERT INTO {name} SELECT * FROM moved
+                    '''
+                ).bindparams(start=period, end=_add_months(period, 1))
+            )
+            await self.database.execute(
+                text(f'ALTER TABLE change_history ATTACH PARTITION {name} FOR VALUES {bounds}')
+            )
+
     async def update(self, id: int, data: BaseSchema) -> BaseSchema:
         raise NotImplementedError('Change history entity can\'t be updated!')
 
     async def delete(self, id: int) -> None:
         raise NotImplementedError('Change history entity can\'t be deleted!')
+
+
+def _add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+
+    return day.replace(year=day.year + month // 12, month=month % 12 + 1)
+
+
+def _partition_name(period: date) -> str:
+    return f'change_history_p{period:%Y_%m}'
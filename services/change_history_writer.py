@@ -0,0 +1,200 @@
+import asyncio
+import contextvars
+import logging
+import time
+from typing import List, Optional
+
+from databases import Database
+
+from models.change_history import change_history_table
+
+
+logger = logging.getLogger(__name__)
+
+SYNC = 'sync'
+WRITE_BEHIND = 'write_behind'
+
+
+class ChangeHistoryWriter:
+    """Writes change history rows in one of two modes
+
+    In `sync` mode history is written by the statement which changes
+    an entity, so it is committed or rolled back together with the change.
+
+    In `write_behind` mode services put history rows to a bounded
+    in-process queue after their transaction is committed, and a background
+    worker writes them by multi-row inserts when `batch_size` rows
+    are queued or every `flush_interval` seconds. Writers wait for free
+    space when the queue is full, so memory usage is bounded by `queue_size`.
+    Queued rows are written on shutdown, but rows which are not written yet
+    are lost if the process is killed, batches failed `max_retries` times
+    are dropped, and history becomes visible to readers with a delay
+    of up to `flush_interval` seconds.
+
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        mode: str = SYNC,
+        queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1,
+        max_retries: int = 3
+    ) -> None:
+        """Construct a new :class: `ChangeHistoryWriter`
+
+        :param `database` - an instance of `databases.Database`
+        for asynchronous work with database
+
+        :optional param `mode` - `sync` or `write_behind`
+
+        :optional param `queue_size` - maximum number of queued rows
+
+        :optional param `batch_size` - number of rows which triggers
+        a flush and maximum number of rows written by one insert
+
+        :optional param `flush_interval` - maximum number of seconds
+        rows stay in the queue while the worker is running
+
+        :optional param `max_retries` - number of attempts to write
+        a batch before it is dropped
+
+        """
+
+        if mode not in (SYNC, WRITE_BEHIND):
+            raise ValueError(f'Unknown change history mode {mode}')
+
+        self.database = database
+        self.mode = mode
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._queue: Optional[asyncio.Queue] = None
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+
+    @property
+    def is_write_behind(self) -> bool:
+        """Whether history rows are queued instead of being written
+        by the statement which changes an entity
+
+        """
+
+        return self.mode == WRITE_BEHIND
+
+    async def start(self) -> None:
+        """Starts the background worker in `write_behind` mode
+
+        """
+
+        if not self.is_write_behind or self._worker is not None:
+            return
+
+        self._queue = asyncio.Queue(self.queue_size)
+        self._batch_ready = asyncio.Event()
+        self._stopping = False
+        # Empty context keeps the worker from sharing database connection,
+        # which `databases` keeps in a context variable, with the caller
+        self._worker = contextvars.Context().run(asyncio.ensure_future, self._run())
+
+    async def stop(self) -> None:
+        """Writes queued rows and stops the background worker,
+        must be called before the database is disconnected
+
+        """
+
+        if self._worker is None:
+            return
+
+        self._stopping = True
+        self._batch_ready.set()
+        await self._worker
+        self._worker = None
+
+    async def enqueue(self, rows: List[dict]) -> None:
+        """Puts change history rows to the queue, waits for free space
+        if the queue is full, rows are written at once if the worker
+        is not running
+
+        :param `rows` - dictionaries with values of `change_history` columns
+
+        """
+
+        if self._worker is None or self._stopping:
+            await self._write(rows)
+            return
+
+        for row in rows:
+            await self._queue.put(row)
+            self.enqueued += 1
+
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+
+    def get_stats(self) -> dict:
+        """Returns queue counters
+
+        """
+
+        return {
+            'mode': self.mode,
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'queue_size': self.queue_size,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'flushes': self.flushes,
+            'last_flush_latency': self.last_flush_latency,
+            'max_flush_latency': self.max_flush_latency
+        }
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+            self._batch_ready.clear()
+            await self._flush()
+
+        await self._flush()
+
+    async def _flush(self) -> None:
+        while not self._queue.empty():
+            rows = []
+
+            while len(rows) < self.batch_size and not self._queue.empty():
+                rows.append(self._queue.get_nowait())
+
+            await self._write(rows)
+
+    async def _write(self, rows: List[dict]) -> None:
+        for attempt in range(1, self.max_retries + 1):
+            started_at = time.perf_counter()
+
+            try:
+                await self.database.execute(change_history_table.insert().values(rows))
+            except Exception as exc:
+                if attempt == self.max_retries:
+                    self.dropped += len(rows)
+                    logger.error('Dropped %d change history rows: %s', len(rows), exc)
+                    return
+
+                await asyncio.sleep(attempt * 0.5)
+            else:
+                latency = time.perf_counter() - started_at
+                self.written += len(rows)
+                self.flushes += 1
+                self.last_flush_latency = latency
+                self.max_flush_latency = max(self.max_flush_latency, latency)
+                return
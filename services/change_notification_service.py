@@ -0,0 +1,262 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Set
+
+import asyncpg
+
+from helpers.configuration_cache import ConfigurationCache
+
+
+logger = logging.getLogger(__name__)
+
+
+class SubscriptionLimitError(Exception):
+    """Raised when the worker already serves the maximum number of watchers
+
+    """
+
+
+class Subscription:
+    """Subscription to changes of a single environment
+
+    Pending changes are conflated into a single flag, so a slow
+    consumer costs constant memory and always catches up
+    with the latest version.
+
+    """
+
+    def __init__(self, service: 'ChangeNotificationService', code: str) -> None:
+        """Construct a new :class: `Subscription`
+
+        :param `service` - an instance of `ChangeNotificationService`
+        which owns the subscription
+
+        :param `code` - unique code of environment
+
+        """
+
+        self.service = service
+        self.code = code
+        self._changed = asyncio.Event()
+
+    def notify(self) -> None:
+        """Marks environment as changed
+
+        """
+
+        self._changed.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Waits for a change of environment
+
+        :param `timeout` - maximum waiting time in seconds
+
+        :return `True` if environment has changed
+        or `False` if timeout has expired
+
+        """
+
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+
+        self._changed.clear()
+
+        return True
+
+    def close(self) -> None:
+        """Removes subscription from its service
+
+        """
+
+        self.service.unsubscribe(self)
+
+
+class ChangeNotificationService:
+    """Service which listens to environment change notifications
+    sent by database triggers and fans them out to subscribers
+
+    The service keeps a single dedicated connection per worker,
+    so idle subscribers do not cost any database queries.
+
+    """
+
+    channel = 'environment_changes'
+
+    def __init__(
+        self,
+        connection_string: str,
+        configuration_cache: ConfigurationCache,
+        max_subscribers: int,
+        reconnect_interval: float = 5
+    ) -> None:
+        """Construct a new :class: `ChangeNotificationService`
+
+        :param `connection_string` - database connection string
+        used for the listener connection
+
+        :param `configuration_cache` - an instance of
+        `helpers.configuration_cache.ConfigurationCache`
+        which is invalidated on every notification
+
+        :param `max_subscribers` - maximum number of subscribers
+        of this worker
+
+        :optional param `reconnect_interval` - seconds between
+        checks of the listener connection
+
+        """
+
+        self.connection_string = connection_string
+        self.configuration_cache = configuration_cache
+        self.max_subscribers = max_subscribers
+        self.reconnect_interval = reconnect_interval
+        self._connection: Optional[asyncpg.Connection] = None
+        self._watchdog: Optional[asyncio.Task] = None
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._subscriptions_count = 0
+
+    async def start(self) -> None:
+        """Opens listener connection and starts its watchdog
+
+        """
+
+        await self._connect()
+        self._watchdog = asyncio.ensure_future(self._watch_connection())
+
+    async def stop(self) -> None:
+        """Stops watchdog, closes listener connection
+        and wakes up all subscribers
+
+        """
+
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+            self._watchdog = None
+
+        if self._connection is not None and not self._connection.is_closed():
+            await self._connection.close()
+
+        self._connection = None
+        self._notify_all()
+
+    def check_capacity(self) -> None:
+        """Checks that one more subscriber can be served,
+        so that the caller can refuse it before subscribing
+
+        :raise `SubscriptionLimitError` if the worker already
+        serves the maximum number of subscribers
+
+        """
+
+        if self._subscriptions_count >= self.max_subscribers:
+            raise SubscriptionLimitError('Too many watchers of configurations!')
+
+    def subscribe(self, code: str) -> Subscription:
+        """Subscribes to changes of environment
+
+        :param `code` - unique code of environment
+
+        :return an instance of `Subscription`, which must be closed
+        by the caller
+
+        """
+
+        self.check_capacity()
+
+        subscription = Subscription(self, code)
+        self._subscriptions.setdefault(code, set()).add(subscription)
+        self._subscriptions_count += 1
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Removes subscription
+
+        :param `subscription` - an instance of `Subscription`
+
+        """
+
+        subscriptions = self._subscriptions.get(subscription.code)
+
+        if subscriptions is None or subscription not in subscriptions:
+            return
+
+        subscriptions.discard(subscription)
+        self._subscriptions_count -= 1
+
+        if not subscriptions:
+            del self._subscriptions[subscription.code]
+
+    async def wait_for_change(
+        self,
+        code: str,
+        timeout: float,
+        version_check=None
+    ) -> bool:
+        """Parks the caller until environment changes or timeout expires
+
+        :param `code` - unique code of environment
+
+        :param `timeout` - maximum waiting time in seconds
+
+        :optional param `version_check` - coroutine function, which is
+        called after the watcher is subscribed and returns `True`
+        if environment has already changed, so that no notification
+        can be missed between the check and the wait
+
+        :return `True` if environment has changed
+        or `False` if timeout has expired
+
+        """
+
+        subscription = self.subscribe(code)
+
+        try:
+            if version_check is not None and await version_check():
+                return True
+
+            return await subscription.wait(timeout)
+        finally:
+            subscription.close()
+
+    def _on_notification(
+        self,
+        connection: asyncpg.Connection,
+        pid: int,
+        channel: str,
+        code: str
+    ) -> None:
+        self.configuration_cache.invalidate_code(code)
+
+        for subscription in self._subscriptions.get(code, ()):
+            subscription.notify()
+
+    def _notify_all(self) -> None:
+        # Notifications may have been lost while the connection was down,
+        # subscribers recheck the version after waking up
+        self.configuration_cache.clear()
+
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.notify()
+
+    async def _connect(self) -> None:
+        self._connection = await asyncpg.connect(self.connection_string)
+        await self._connection.add_listener(self.channel, self._on_notification)
+
+    async def _watch_connection(self) -> None:
+        while True:
+            await asyncio.sleep(self.reconnect_interval)
+
+            if self._connection is not None and not self._connection.is_closed():
+                continue
+
+            try:
+                await self._connect()
+            except (OSError, asyncpg.PostgresError) as exc:
+                logger.warning('Could not reconnect change listener: %s', exc)
+                continue
+
+            self._notify_all()
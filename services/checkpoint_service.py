@@ -0,0 +1,479 @@
+import json
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from databases import Database
+from databases.backends.postgres import Record
+from sqlalchemy import (
+    DateTime, Integer, Text, and_, any_, bindparam, cast, desc, func, literal_column, or_, select
+)
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+
+from models.change_history import change_history_table
+from models.configuration_checkpoints import configuration_checkpoints_table
+from models.environments import environments_table
+from models.variables import variables_table
+from .snapshot_service import SnapshotService
+
+
+# Start of the oldest transaction in progress, services stamp rows and
+# change history by the time of their transaction, so changes stamped
+# before it are committed and therefore seen by a checkpoint taken now.
+# Start of transactions of other roles is visible only to members
+# of `pg_read_all_stats`, see `HIDDEN_SESSIONS`
+HORIZON = literal_column(
+    '''(
+        SELECT CAST(coalesce(min(xact_start), now()) AS timestamp)
+        FROM pg_stat_activity
+        WHERE datname = current_database()
+    )'''
+)
+
+# Number of sessions of the database which the current role can not see
+# transaction start of, so that the horizon would miss their changes
+HIDDEN_SESSIONS = literal_column(
+    '''(
+        SELECT count(*)
+        FROM pg_stat_activity
+        WHERE datname = current_database()
+        AND NOT pg_has_role(usesysid, 'USAGE')
+        AND NOT pg_has_role('pg_read_all_stats', 'USAGE')
+    )'''
+)
+
+
+class CheckpointHorizonError(Exception):
+    """Raised when sessions of other roles are connected to the database
+    and the role taking checkpoints is not allowed to see their transactions
+
+    """
+
+
+class CheckpointService:
+    """Service for working with configuration checkpoints, which keep
+    periodic copies of environment configurations, so that configuration
+    at a point in time is rebuilt by replaying only the change history
+    recorded after the nearest checkpoint
+
+    """
+
+    def __init__(self, database: Database) -> None:
+        """Construct a new :class: `CheckpointService`
+
+        :param `database` - an instance of `databases.Database`
+        for asynchronous work with database
+
+        """
+
+        self.database = database
+
+    async def create(self) -> int:
+        """Takes checkpoints of environments changed since their
+        last checkpoint in a single statement, is meant to be run
+        periodically by `scripts/create_configuration_checkpoints.py`
+
+        The role taking checkpoints has to see transactions of every role
+        which writes configurations, i.e. be the same role or a member
+        of `pg_read_all_stats`, otherwise checkpoints could miss changes
+        of transactions in progress.
+
+        :return number of created checkpoints
+
+        :raise `CheckpointHorizonError` if sessions of other roles
+        are connected and their transactions are not visible
+
+        """
+
+        last_horizon = (
+            select([func.max(configuration_checkpoints_table.c.horizon)])
+            .where(configuration_checkpoints_table.c.env_id == environments_table.c.id)
+            .as_scalar()
+        )
+        taken = (
+            select(
+                [
+                    environments_table.c.id,
+                    func.localtimestamp(),
+                    HORIZON,
+                    cast(SnapshotService.document_column(), JSONB)
+                ]
+            )
+            .select_from(
+                environments_table.outerjoin(
+                    variables_table,
+                    and_(
+                        variables_table.c.env_id == environments_table.c.id,
+                        variables_table.c.is_deleted == False
+                    )
+                )
+            )
+            .where(
+                and_(
+                    environments_table.c.is_deleted == False,
+                    or_(
+                        last_horizon == None,
+                        SnapshotService.version_column() >= last_horizon
+                    )
+                )
+            )
+            .group_by(environments_table.c.id)
+        )
+        query = (
+            configuration_checkpoints_table.insert()
+            .from_select(
+                [
+                    configuration_checkpoints_table.c.env_id,
+                    configuration_checkpoints_table.c.taken_at,
+                    configuration_checkpoints_table.c.horizon,
+                    configuration_checkpoints_table.c.document
+                ],
+                taken
+            )
+            .returning(configuration_checkpoints_table.c.id)
+        )
+
+        # Activity statistics are read once per transaction,
+        # so the check and the horizon see the same sessions
+        async with self.database.transaction():
+            hidden_sessions = await self.database.fetch_val(select([HIDDEN_SESSIONS]))
+
+            if hidden_sessions:
+                raise CheckpointHorizonError(
+                    f'Transactions of {hidden_sessions} sessions of other roles are not visible, '
+                    'take checkpoints by a member of pg_read_all_stats'
+                )
+
+            return len(await self.database.fetch_all(query))
+
+    async def remove(self, keep_days: int) -> None:
+        """Removes checkpoints older than the passed number of days
+        by the database clock, which checkpoints are stamped by,
+        configurations older than the remaining checkpoints
+        are rebuilt from the whole change history
+
+        :param `keep_days` - number of days to keep checkpoints
+
+        """
+
+        query = (
+            configuration_checkpoints_table.delete()
+            .where(
+                configuration_checkpoints_table.c.taken_at
+                < func.localtimestamp() - timedelta(days=keep_days)
+            )
+        )
+
+        await self.database.execute(query)
+
+    async def get_configuration_as_of(self, code: str, as_of: datetime) -> Optional[dict]:
+        """Rebuilds configuration of environment at a point in time
+        from the nearest checkpoint taken before it and the change history
+        recorded between them
+
+        Variables created after the checkpoint start from the value
+        replaced by their first change, or from the current value if they
+        have not been changed since. Change history archived by retention
+        is not replayed, so configurations older than retained history
+        may contain later names and values of variables.
+
+        :param `code` - unique code of environment
+
+        :param `as_of` - point in time, time without offset
+        is local time of the database
+
+        :return dictionary of `ConfigurationSchema` or `None`
+        if environment did not exist at that time
+
+        """
+
+        if as_of.tzinfo is not None:
+            as_of = await self._to_local_time(as_of)
+
+        environment = await self._get_environment(code)
+
+        if (
+            environment is None
+            or environment['created_at'] > as_of
+            or environment['is_deleted'] and environment['deleted_at'] <= as_of
+        ):
+            return None
+
+        checkpoint = await self._get_checkpoint(environment['id'], as_of)
+        horizon = checkpoint['horizon'] if checkpoint is not None else None
+
+        if checkpoint is not None:
+            document = json.loads(checkpoint['document'])
+            name = document['environment_name']
+            variables = {
+                variable['id']: {
+                    **variable,
+                    **{
+                        field: _parse_timestamp(variable[field])
+                        for field in ('created_at', 'updated_at', 'deleted_at')
+                    }
+                }
+                for variable in document['variables']
+            }
+        else:
+            name = environment['name']
+            variables = {}
+
+        new_ids = []
+
+        for variable in await self._get_variables(environment['id'], horizon, as_of):
+            if variable['deleted_at'] is not None and variable['deleted_at'] <= as_of:
+                variables.pop(variable['id'], None)
+            elif variable['created_at'] <= as_of:
+                new_ids.append(variable['id'])
+                variables[variable['id']] = {
+                    'id': variable['id'],
+                    'is_deleted': False,
+                    'created_at': variable['created_at'],
+                    'updated_at': None,
+                    'deleted_at': None,
+                    'name': variable['name'],
+                    'value': variable['value']
+                }
+
+        # Entities which appeared after the checkpoint are rolled back
+        # to their values before the first change, which the replay starts from
+        for change in await self._get_first_changes(
+            new_ids,
+            environment['id'] if checkpoint is None else None
+        ):
+            if change['entity_type'] == environments_table.name:
+                name = change['old_value']
+            else:
+                variables[change['entity_id']][change['field']] = change['old_value']
+
+        for change in await self._get_changes(
+            list(variables),
+            environment['id'],
+            horizon,
+            as_of
+        ):
+            if change['entity_type'] == environments_table.name:
+                if change['field'] == 'name':
+                    name = change['new_value']
+            elif change['field'] in ('name', 'value'):
+                variables[change['entity_id']][change['field']] = change['new_value']
+                variables[change['entity_id']]['updated_at'] = change['created_at']
+
+        return {
+            'environment_name': name,
+            'variables': sorted(
+                variables.values(),
+                key=lambda variable: variable['created_at'],
+                reverse=True
+            )
+        }
+
+    async def _to_local_time(self, value: datetime) -> datetime:
+        """Converts time with offset to local time of the database,
+        which rows are stamped by
+
+        """
+
+        query = select(
+            [cast(cast(bindparam('value', value), DateTime(timezone=True)), DateTime)]
+        )
+
+        return await self.database.fetch_val(query)
+
+    async def _get_environment(self, code: str) -> Record:
+        query = (
+            select(
+                [
+                    environments_table.c.id,
+                    environments_table.c.name,
+                    environments_table.c.is_deleted,
+                    environments_table.c.created_at,
+                    environments_table.c.deleted_at
+                ]
+            )
+            .select_from(environments_table)
+            .where(environments_table.c.code == code)
+        )
+
+        return await self.database.fetch_one(query)
+
+    async def _get_checkpoint(self, env_id: int, as_of: datetime) -> Record:
+        query = (
+            select(
+                [
+                    configuration_checkpoints_table.c.horizon,
+                    cast(configuration_checkpoints_table.c.document, Text).label('document')
+                ]
+            )
+            .select_from(configuration_checkpoints_table)
+            .where(
+                and_(
+                    configuration_checkpoints_table.c.env_id == env_id,
+                    configuration_checkpoints_table.c.taken_at <= as_of
+                )
+            )
+            .order_by(desc(configuration_checkpoints_table.c.taken_at))
+            .limit(1)
+        )
+
+        return await self.database.fetch_one(query)
+
+    async def _get_variables(
+        self,
+        env_id: int,
+        horizon: Optional[datetime],
+        as_of: datetime
+    ) -> List[Record]:
+        """Selects variables created or deleted after checkpoint
+        horizon up to the point in time, or all variables created
+        up to it if there is no checkpoint
+
+        """
+
+        condition = variables_table.c.created_at <= as_of
+
+        if horizon is not None:
+            condition = or_(
+                and_(condition, variables_table.c.created_at >= horizon),
+                and_(
+                    variables_table.c.deleted_at >= horizon,
+                    variables_table.c.deleted_at <= as_of
+                )
+            )
+
+        query = (
+            select(
+                [
+                    variables_table.c.id,
+                    variables_table.c.name,
+                    variables_table.c.value,
+                    variables_table.c.created_at,
+                    variables_table.c.deleted_at
+                ]
+            )
+            .select_from(variables_table)
+            .where(and_(variables_table.c.env_id == env_id, condition))
+        )
+
+        return await self.database.fetch_all(query)
+
+    async def _get_first_changes(
+        self,
+        var_ids: List[int],
+        env_id: Optional[int]
+    ) -> List[Record]:
+        """Selects the first recorded change of every field
+        of variables and optionally of environment
+
+        """
+
+        condition = and_(
+            change_history_table.c.entity_type == variables_table.name,
+            change_history_table.c.entity_id == any_(
+                bindparam('var_ids', var_ids, type_=ARRAY(Integer))
+            )
+        )
+
+        if env_id is not None:
+            condition = or_(
+                condition,
+                and_(
+                    change_history_table.c.entity_type == environments_table.name,
+                    change_history_table.c.entity_id == env_id
+                )
+            )
+        elif not var_ids:
+            return []
+
+        query = (
+            select(
+                [
+                    change_history_table.c.entity_type,
+                    change_history_table.c.entity_id,
+                    change_history_table.c.field,
+                    change_history_table.c.old_value
+                ]
+            )
+            .distinct(
+                change_history_table.c.entity_type,
+                change_history_table.c.entity_id,
+                change_history_table.c.field
+            )
+            .select_from(change_history_table)
+            .where(and_(condition, change_history_table.c.field.in_(['name', 'value'])))
+            .order_by(
+                change_history_table.c.entity_type,
+                change_history_table.c.entity_id,
+                change_history_table.c.field,
+                change_history_table.c.id
+            )
+        )
+
+        return await self.database.fetch_all(query)
+
+    async def _get_changes(
+        self,
+        var_ids: List[int],
+        env_id: int,
+        horizon: Optional[datetime],
+        as_of: datetime
+    ) -> List[Record]:
+        """Selects changes of environment and its variables recorded
+        after checkpoint horizon up to the point in time in the order
+        they were written, only partitions of that period are scanned
+
+        """
+
+        condition = change_history_table.c.created_at <= as_of
+
+        if horizon is not None:
+            condition = and_(condition, change_history_table.c.created_at >= horizon)
+
+        query = (
+            select(
+                [
+                    change_history_table.c.entity_type,
+                    change_history_table.c.entity_id,
+                    change_history_table.c.field,
+                    change_history_table.c.new_value,
+                    change_history_table.c.created_at
+                ]
+            )
+            .select_from(change_history_table)
+            .where(
+                and_(
+                    condition,
+                    or_(
+                        and_(
+                            change_history_table.c.entity_type == variables_table.name,
+                            change_history_table.c.entity_id == any_(
+                                bindparam('var_ids', var_ids, type_=ARRAY(Integer))
+                            )
+                        ),
+                        and_(
+                            change_history_table.c.entity_type == environments_table.name,
+                            change_history_table.c.entity_id == env_id
+                        )
+                    )
+                )
+            )
+            .order_by(change_history_table.c.id)
+        )
+
+        return await self.database.fetch_all(query)
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parses timestamp of JSON document built by PostgreSQL,
+    which trims trailing zeros of fractional seconds
+
+    """
+
+    if value is None:
+        return None
+
+    value, _, fraction = value.partition('.')
+
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S').replace(
+        microsecond=int(fraction.ljust(6, '0')) if fraction else 0
+    )
@@ -0,0 +1,534 @@
+import hashlib
+import json
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+
+from helpers import configuration_formats
+from helpers.compression import Compressor
+from helpers.configuration_cache import ConfigurationCache
+from helpers.single_flight import SingleFlight
+from .change_notification_service import ChangeNotificationService, SubscriptionLimitError
+from .checkpoint_service import CheckpointService
+from .snapshot_service import SnapshotService
+from .variable_service import VariableService
+
+
+class ConfigurationService:
+    """Service for reading rendered configurations
+
+    """
+
+    def __init__(
+        self,
+        snapshot_service: SnapshotService,
+        var_service: VariableService,
+        checkpoint_service: CheckpointService,
+        configuration_cache: ConfigurationCache,
+        change_notification_service: ChangeNotificationService,
+        single_flight: SingleFlight,
+        compressor: Compressor
+    ) -> None:
+        """Construct a new :class: `ConfigurationService`
+
+        :param `snapshot_service` - an instance of `services.SnapshotService`
+        for reading configuration snapshots
+
+        :param `var_service` - an instance of `services.VariableService`
+        for reading variable values in compact formats
+
+        :param `checkpoint_service` - an instance of
+        `services.CheckpointService` for rebuilding configurations
+        at a point in time
+
+        :param `configuration_cache` - an instance of
+        `helpers.configuration_cache.ConfigurationCache`
+        which keeps rendered configurations
+
+        :param `change_notification_service` - an instance of
+        `services.ChangeNotificationService` for watching
+        environment changes
+
+        :param `single_flight` - an instance of
+        `helpers.single_flight.SingleFlight` which coalesces
+        concurrent identical loads
+
+        :param `compressor` - an instance of `helpers.compression.Compressor`
+        which keeps compressed configurations
+
+        """
+
+        self.snapshot_service = snapshot_service
+        self.var_service = var_service
+        self.checkpoint_service = checkpoint_service
+        self.configuration_cache = configuration_cache
+        self.change_notification_service = change_notification_service
+        self.single_flight = single_flight
+        self.compressor = compressor
+
+    async def get_configuration(
+        self,
+        code: str,
+        format: str = configuration_formats.JSON
+    ) -> Optional[dict]:
+        """Returns rendered configuration of environment
+        from the cache or from the database
+
+        :param `code` - unique code of environment
+
+        :optional param `format` - output format, JSON document
+        of `ConfigurationSchema` by default
+
+        :return dictionary with `etag` of configuration version
+        and `content` with rendered document
+        or `None` if environment does not exist
+
+        """
+
+        code = normalize_code(code)
+
+        if code is None:
+            return None
+
+        configuration = self.configuration_cache.get(code, format)
+
+        if configuration is not None:
+            return configuration
+
+        generation = self.configuration_cache.generation
+
+        async def load() -> Optional[dict]:
+            environment = await self.load_configuration(code, format)
+
+            if environment is None:
+                return None
+
+            configuration = {
+                'etag': environment['etag'],
+                'content': environment['content']
+            }
+            self.configuration_cache.set(
+                code,
+                environment['id'],
+                configuration,
+                format,
+                generation
+            )
+
+            return configuration
+
+        return await self.single_flight.do(
+            ('configuration', code, format, generation),
+            load
+        )
+
+    async def load_configuration(
+        self,
+        code: str,
+        format: str = configuration_formats.JSON
+    ) -> Optional[dict]:
+        """Reads pre-serialized configuration snapshot of environment
+        by a single primary key lookup, compact formats are rendered
+        from names and values of variables only
+
+        :param `code` - unique code of environment
+
+        :optional param `format` - output format, JSON document
+        of `ConfigurationSchema` by default
+
+        :return dictionary with environment `id`, `etag` of configuration
+        version and `content` with rendered document or `None`
+        if environment does not exist
+
+        """
+
+        if format == configuration_formats.JSON:
+            snapshot = await self.snapshot_service.get_by_code(code)
+
+            if snapshot is None:
+                return None
+
+            return {
+                'id': snapshot['env_id'],
+                'etag': self.make_etag(snapshot['env_id'], snapshot['version']),
+                'content': snapshot['document']
+            }
+
+        environment = await self.var_service.get_values_by_code(code)
+
+        if environment is None:
+            return None
+
+        return {
+            'id': environment['id'],
+            'etag': self.make_etag(environment['id'], environment['version'], format),
+            'content': configuration_formats.render(
+                json.loads(environment['document']),
+                format
+            )
+        }
+
+    def encode_configuration(
+        self,
+        configuration: dict,
+        accept_encoding: Optional[str]
+    ) -> Tuple[bytes, Optional[str], str]:
+        """Compresses rendered configuration by encoding accepted
+        by client, compressed content is cached by ETag, so it is
+        compressed once per configuration version and format
+
+        :param `configuration` - configuration returned by `get_configuration`
+
+        :param `accept_encoding` - value of `Accept-Encoding` header
+
+        :return content, its encoding, which is `None` if content
+        is not compressed, and its ETag, which differs between encodings
+
+        """
+
+        content = configuration['content']
+        etag = configuration['etag']
+        encoding = self.compressor.negotiate(accept_encoding, len(content))
+
+        if encoding is None:
+            return content, None, etag
+
+        return (
+            self.compressor.compress(content, encoding, etag),
+            encoding,
+            f'{etag[:-1]}-{encoding}"'
+        )
+
+    async def get_configuration_as_of(
+        self,
+        code: str,
+        as_of: datetime,
+        format: str = configuration_formats.JSON
+    ) -> Optional[dict]:
+        """Returns configuration of environment at a point in time,
+        which is rebuilt from checkpoint and change history
+        and is not cached
+
+        :param `code` - unique code of environment
+
+        :param `as_of` - point in time
+
+        :optional param `format` - output format, JSON document
+        of `ConfigurationSchema` by default
+
+        :return dictionary with `content` with rendered document
+        or `None` if environment did not exist at that time
+
+        """
+
+        code = normalize_code(code)
+
+        if code is None:
+            return None
+
+        configuration = await self.checkpoint_service.get_configuration_as_of(code, as_of)
+
+        if configuration is None:
+            return None
+
+        if format == configuration_formats.JSON:
+            content = json.dumps(
+                configuration,
+                ensure_ascii=False,
+                default=lambda value: value.isoformat()
+            ).encode()
+        else:
+            content = configuration_formats.render(
+                {
+                    variable['name']: variable['value']
+                    for variable in reversed(configuration['variables'])
+                },
+                format
+            )
+
+        return {'content': content}
+
+    async def iterate_configurations(
+        self,
+        codes: List[str]
+    ) -> AsyncIterator[dict]:
+        """Reads configuration snapshots of many environments in a single
+        statement and yields them as rows arrive from a server-side cursor
+
+        :param `codes` - unique codes of environments,
+        invalid and unknown codes are skipped
+
+        :return async iterator of dictionaries with environment `code`
+        as it was passed, `etag` of configuration version
+        and `content` with JSON document
+
+        """
+
+        # Codes are looked up and cached in the hex form,
+        # but returned in the form passed by client
+        passed_codes = {}
+
+        for code in codes:
+            normalized_code = normalize_code(code)
+
+            if normalized_code is not None:
+                passed_codes.setdefault(normalized_code, []).append(code)
+
+        if not passed_codes:
+            return
+
+        generation = self.configuration_cache.generation
+
+        async for snapshot in self.snapshot_service.iterate_by_codes(list(passed_codes)):
+            normalized_code = normalize_code(str(snapshot['code']))
+            configuration = {
+                'etag': self.make_etag(snapshot['env_id'], snapshot['version']),
+                'content': snapshot['document']
+            }
+            self.configuration_cache.set(
+                normalized_code,
+                snapshot['env_id'],
+                configuration,
+                generation=generation
+            )
+
+            for code in dict.fromkeys(passed_codes[normalized_code]):
+                yield {'code': code, **configuration}
+
+    async def get_changes(self, code: str, since: int) -> Optional[dict]:
+        """Returns variables changed since the passed configuration version,
+        the cost depends on number of changes, not on environment size
+
+        :param `code` - unique code of environment
+
+        :param `since` - configuration version known by client,
+        `0` to receive all variables
+
+        :return dictionary with current configuration `version`
+        and `variables` created, updated or deleted after `since`
+        or `None` if environment does not exist
+
+        """
+
+        code = normalize_code(code)
+
+        if code is None:
+            return None
+
+        rows = await self.var_service.get_changes_by_code(code, since)
+
+        if not rows:
+            return None
+
+        return {
+            'version': rows[0]['version'],
+            'variables': [row for row in rows if row['id'] is not None]
+        }
+
+    async def get_etag(
+        self,
+        code: str,
+        format: str = configuration_formats.JSON
+    ) -> Optional[str]:
+        """Returns ETag of the current configuration version
+        without loading variables
+
+        :param `code` - unique code of environment
+
+        :optional param `format` - output format of configuration
+
+        :return strong ETag or `None` if environment does not exist
+
+        """
+
+        code = normalize_code(code)
+
+        if code is None:
+            return None
+
+        # Version checks do not count as configuration reads
+        configuration = self.configuration_cache.peek(code, format)
+
+        if configuration is not None:
+            return configuration['etag']
+
+        snapshot = await self.single_flight.do(
+            ('version', code, self.configuration_cache.generation),
+            lambda: self.snapshot_service.get_version_by_code(code)
+        )
+
+        if snapshot is None:
+            return None
+
+        return self.make_etag(snapshot['env_id'], snapshot['version'], format)
+
+    async def wait_for_change(
+        self,
+        code: str,
+        etag: str,
+        timeout: float,
+        format: str = configuration_formats.JSON
+    ) -> bool:
+        """Waits until configuration version differs from the passed one
+
+        :param `code` - unique code of environment
+
+        :param `etag` - ETag of configuration version known by client,
+        in any of its encodings
+
+        :param `timeout` - maximum waiting time in seconds
+
+        :optional param `format` - output format of configuration
+
+        :return `True` if configuration has changed
+        or `False` if timeout has expired
+
+        """
+
+        code = normalize_code(code)
+        etag = self.strip_encoding(etag)
+
+        if code is None:
+            return True
+
+        async def has_changed() -> bool:
+            return await self.get_etag(code, format) != etag
+
+        if not await self.change_notification_service.wait_for_change(
+            code,
+            timeout,
+            version_check=has_changed
+        ):
+            return False
+
+        return await has_changed()
+
+    def stream_configuration(
+        self,
+        code: str,
+        etag: Optional[str] = None,
+        keepalive: float = 15
+    ) -> AsyncIterator[Optional[dict]]:
+        """Returns iterator which subscribes to changes of environment
+        and yields its configuration every time it changes
+
+        The subscription is made once iteration starts and is closed
+        when it stops, so an iterator which is never started holds
+        no subscription.
+
+        :param `code` - unique code of environment
+
+        :optional param `etag` - ETag of configuration version known
+        by client, which is not yielded again
+
+        :optional param `keepalive` - seconds after which `None`
+        is yielded if there were no changes
+
+        :return async iterator of configurations in the same form
+        as `get_configuration` returns, or `None` on keepalive,
+        iteration stops when environment is deleted
+
+        :raise `SubscriptionLimitError` if the worker already
+        serves the maximum number of subscribers
+
+        """
+
+        self.change_notification_service.check_capacity()
+
+        return self._stream_configuration(normalize_code(code), etag, keepalive)
+
+    async def _stream_configuration(
+        self,
+        code: str,
+        etag: Optional[str],
+        keepalive: float
+    ) -> AsyncIterator[Optional[dict]]:
+        try:
+            subscription = self.change_notification_service.subscribe(code)
+        except SubscriptionLimitError:
+            # Other streams took the remaining capacity after the check,
+            # the client reconnects as it does after any dropped stream
+            return
+
+        try:
+            while True:
+                configuration = await self.get_configuration(code)
+
+                if configuration is None:
+                    return
+
+                if configuration['etag'] != etag:
+                    etag = configuration['etag']
+                    yield configuration
+
+                while not await subscription.wait(keepalive):
+                    yield None
+        finally:
+            subscription.close()
+
+    def get_cache_stats(self) -> dict:
+        """Returns counters of configuration cache,
+        of coalesced loads and of compressions
+
+        """
+
+        return {
+            **self.configuration_cache.get_stats(),
+            **self.single_flight.get_stats(),
+            **self.compressor.get_stats()
+        }
+
+    @staticmethod
+    def make_etag(
+        env_id: int,
+        version: datetime,
+        format: str = configuration_formats.JSON
+    ) -> str:
+        """Builds strong ETag of configuration version,
+        which differs between output formats
+
+        :param `env_id` - environment identifier
+
+        :param `version` - version of environment configuration
+
+        :optional param `format` - output format of configuration
+
+        """
+
+        tag = f'{env_id}:{version.isoformat()}'
+
+        if format != configuration_formats.JSON:
+            tag = f'{tag}:{format}'
+
+        digest = hashlib.sha1(tag.encode())
+
+        return f'"{digest.hexdigest()}"'
+
+    @staticmethod
+    def strip_encoding(etag: str) -> str:
+        """Removes content encoding from ETag of compressed
+        configuration, e.g. `"<digest>-gzip"` becomes `"<digest>"`
+
+        :param `etag` - strong ETag
+
+        """
+
+        digest, _, encoding = etag.partition('-')
+
+        return f'{digest}"' if encoding else etag
+
+
+def normalize_code(code: str) -> Optional[str]:
+    """Converts environment code to the hex form used as cache
+    and notification key
+
+    :param `code` - unique code of environment
+
+    :return hex string or `None` if code is not a valid UUID
+
+    """
+
+    try:
+        return uuid.UUID(code).hex
+    except ValueError:
+        return None
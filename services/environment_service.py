@@ -1,13 +1,17 @@
-from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 from databases import Database
 from databases.backends.postgres import Record
-from sqlalchemy import desc, func, select, and_
+from sqlalchemy import String, and_, cast, desc, func, literal, select
 
+from helpers.configuration_cache import ConfigurationCache
+from helpers.pagination import exact_total, paginate
+from helpers.projection import select_columns
 from models.environments import environments_table
-from schemas.environment_schemas import EnvironmentCreateSchema, EnvironmentUpdateSchema
+from schemas.environment_schemas import EnvironmentCloneSchema, EnvironmentCreateSchema, EnvironmentUpdateSchema
 from .base_service import BaseService
+from .change_history_writer import ChangeHistoryWriter
+from .snapshot_service import SnapshotService
 from .variable_service import VariableService
 
 
@@ -19,7 +23,10 @@ class EnvironmentService(BaseService):
     def __init__(
         self,
         database: Database,
-        var_service: VariableService
+        var_service: VariableService,
+        snapshot_service: SnapshotService,
+        configuration_cache: ConfigurationCache,
+        history_writer: ChangeHistoryWriter
     ) -> None:
         """Construct a new :class: `EnvironmentService`
 
@@ -29,10 +36,24 @@ class EnvironmentService(BaseService):
         :param `var_service` - an instance of `services.VariableService` 
         for work with variables entity
 
+        :param `snapshot_service` - an instance of `services.SnapshotService`
+        for keeping configuration snapshots current
+
+        :param `configuration_cache` - an instance of
+        `helpers.configuration_cache.ConfigurationCache`
+        which keeps rendered configurations
+
+        :param `history_writer` - an instance of
+        `services.ChangeHistoryWriter` which writes change history
+        of updated environments
+
         """
 
         self.database = database
         self.var_service = var_service
+        self.snapshot_service = snapshot_service
+        self.configuration_cache = configuration_cache
+        self.history_writer = history_writer
 
     async def create(
         self,
@@ -55,7 +76,7 @@ class EnvironmentService(BaseService):
                     name=data.name,
                     description=data.description,
                     app_id=data.app_id,
-                    created_at=datetime.now()
+                    created_at=func.localtimestamp()
                 )
                 .returning(
                     environments_table.c.id,
@@ -68,8 +89,10 @@ class EnvironmentService(BaseService):
                     environments_table.c.is_deleted
                 )
             )
+            environment = await self.database.fetch_one(query)
+            await self.snapshot_service.refresh([environment['id']])
 
-            return await self.database.fetch_one(query)
+            return environment
     
     async def update(
         self,
@@ -77,6 +100,7 @@ class EnvironmentService(BaseService):
         data: EnvironmentUpdateSchema
     ) -> Record:
         """Updates an environment according to the passed data
+        and records change history of its fields
 
         :param `id` - identifier of environment
 
@@ -88,14 +112,88 @@ class EnvironmentService(BaseService):
 
         """
 
+        history = [] if self.history_writer.is_write_behind else None
+
+        async with self.database.transaction():
+            environment = await self.update_with_history(
+                environments_table,
+                id,
+                {
+                    'name': data.name,
+                    'description': data.description
+                },
+                [
+                    environments_table.c.id,
+                    environments_table.c.name,
+                    environments_table.c.code,
+                    environments_table.c.description,
+                    environments_table.c.created_at,
+                    environments_table.c.updated_at,
+                    environments_table.c.deleted_at,
+                    environments_table.c.is_deleted
+                ],
+                history=history
+            )
+            await self.snapshot_service.refresh([id])
+
+        self.configuration_cache.invalidate([id])
+
+        if history:
+            await self.history_writer.enqueue(history)
+
+        return environment
+
+    async def clone(
+        self,
+        id: int,
+        data: EnvironmentCloneSchema
+    ) -> Record:
+        """Creates a new environment of the same application with
+        a new code and copies variables of environment to it
+        inside the database
+
+        :param `id` - identifier of source environment
+
+        :param `data` - an instance of `EnvironmentCloneSchema`
+        which provide data of the new environment
+
+        :return an instance of `databases.backends.postgres.Record`
+        which provide data of the new environment or `None`
+        if source environment does not exist
+
+        """
+
         async with self.database.transaction():
+            source = (
+                select(
+                    [
+                        cast(literal(data.name), String),
+                        func.coalesce(
+                            cast(literal(data.description), String),
+                            environments_table.c.description
+                        ),
+                        environments_table.c.app_id,
+                        func.localtimestamp()
+                    ]
+                )
+                .select_from(environments_table)
+                .where(
+                    and_(
+                        environments_table.c.id == id,
+                        environments_table.c.is_deleted == False
+                    )
+                )
+            )
             query = (
-                environments_table.update()
-                .where(environments_table.c.id == id)
-                .values(
-                    name=data.name,
-                    description=data.description,
-                    updated_at=datetime.now()
+                environments_table.insert()
+                .from_select(
+                    [
+                        environments_table.c.name,
+                        environments_table.c.description,
+                        environments_table.c.app_id,
+                        environments_table.c.created_at
+                    ],
+                    source
                 )
                 .returning(
                     environments_table.c.id,
@@ -108,8 +206,13 @@ class EnvironmentService(BaseService):
                     environments_table.c.is_deleted
                 )
             )
+            environment = await self.database.fetch_one(query)
+
+            if environment is not None:
+                await self.var_service.copy_by_env_id(id, environment['id'])
+                await self.snapshot_service.refresh([environment['id']])
 
-            return await self.database.fetch_one(query)
+            return environment
 
     async def delete(self, id: int) -> None:
         """Deletes an environment according passed environment identifier
@@ -124,11 +227,14 @@ class EnvironmentService(BaseService):
                 .where(environments_table.c.id == id)
                 .values(
                     is_deleted=True,
-                    deleted_at=datetime.now()
+                    deleted_at=func.localtimestamp()
                 )
             )
             await self.database.execute(query)
-            await self.var_service.delete_by_env_id(id)
+            await self.var_service.delete_by_env_ids([id])
+            await self.snapshot_service.remove([id])
+
+        self.configuration_cache.invalidate([id])
 
     async def get_one(self, id: int) -> Record:
         """Selects environment by its id from the database
@@ -164,6 +270,9 @@ class EnvironmentService(BaseService):
         app_id: int,
         page: int,
         per_page: int,
+        cursor: Optional[str] = None,
+        include_total: bool = False,
+        fields: Optional[List[str]] = None
     ) -> List[Record]:
         """Selects all environments for application from the database
 
@@ -173,24 +282,40 @@ class EnvironmentService(BaseService):
 
         :param `per_page` - number of entities on one page
 
+        :optional param `cursor` - cursor of the previous page,
+        page number is ignored if it is passed
+
+        :optional param `include_total` - whether to select total number
+        of entities as `total_count` column of every row
+
+        :optional param `fields` - names of selected columns,
+        identifier and creation date are always selected
+
         :return list of `databases.backends.postgres.Record`
         which provide environment data
 
+        :raise `helpers.pagination.InvalidCursorError` if cursor is malformed
+
+        :raise `helpers.projection.InvalidFieldsError` if some of fields
+        is not a column
+
         """
 
-        offset = (page - 1) * per_page
         query = (
             select(
-                [
-                    environments_table.c.id,
-                    environments_table.c.name,
-                    environments_table.c.code,
-                    environments_table.c.description,
-                    environments_table.c.created_at,
-                    environments_table.c.updated_at,
-                    environments_table.c.deleted_at,
-                    environments_table.c.is_deleted
-                ]
+                select_columns(
+                    [
+                        environments_table.c.id,
+                        environments_table.c.name,
+                        environments_table.c.code,
+                        environments_table.c.description,
+                        environments_table.c.created_at,
+                        environments_table.c.updated_at,
+                        environments_table.c.deleted_at,
+                        environments_table.c.is_deleted
+                    ],
+                    fields
+                )
             )
             .select_from(environments_table)
             .where(
@@ -199,9 +324,14 @@ class EnvironmentService(BaseService):
                     environments_table.c.is_deleted == False
                 )
             )
-            .order_by(desc(environments_table.c.created_at))
-            .limit(per_page)
-            .offset(offset)
+        )
+        query = paginate(
+            query,
+            environments_table,
+            per_page,
+            page,
+            cursor,
+            exact_total() if include_total else None
         )
 
         return await self.database.fetch_all(query)
@@ -260,26 +390,52 @@ class EnvironmentService(BaseService):
         
         return await self.database.fetch_val(query)
 
-    async def delete_by_app_id(self, app_id):
-        """Deletes all environments by application identifier
+    async def delete_by_app_id(
+        self,
+        app_id: int,
+        limit: Optional[int] = None
+    ) -> int:
+        """Deletes environments of application and their variables
+        by a constant number of set-based statements
 
         :param `app_id` - identifier of application
 
+        :optional param `limit` - maximum number of environments
+        to delete, all of them by default
+
+        :return number of deleted environments
+
         """
 
         async with self.database.transaction():
+            environments = (
+                select([environments_table.c.id])
+                .select_from(environments_table)
+                .where(
+                    and_(
+                        environments_table.c.app_id == app_id,
+                        environments_table.c.is_deleted == False
+                    )
+                )
+                .order_by(environments_table.c.id)
+                .limit(limit)
+                .with_for_update()
+            )
             query = (
                 environments_table.update()
-                .where(environments_table.c.app_id == app_id)
+                .where(environments_table.c.id.in_(environments))
                 .values(
                     is_deleted=True,
-                    deleted_at=datetime.now()
-                )
-                .returning(
-                    environments_table.c.id,
+                    deleted_at=func.localtimestamp()
                 )
+                .returning(environments_table.c.id)
             )
-            deleted_envs = await self.database.fetch_all(query)
+            env_ids = [env['id'] for env in await self.database.fetch_all(query)]
+
+            if env_ids:
+                await self.var_service.delete_by_env_ids(env_ids)
+                await self.snapshot_service.remove(env_ids)
+
+        self.configuration_cache.invalidate(env_ids)
 
-        for env in deleted_envs:
-            await self.var_service.delete_by_env_id(env['id'])
+        return len(env_ids)
@@ -0,0 +1,237 @@
+from typing import AsyncIterator, List
+
+from databases import Database
+from databases.backends.postgres import Record
+from sqlalchemy import Integer, Text, and_, any_, bindparam, cast, desc, func, literal_column, select
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, aggregate_order_by, insert
+
+from models.configuration_snapshots import configuration_snapshots_table
+from models.environments import environments_table
+from models.variables import variables_table
+
+
+class SnapshotService:
+    """Service for working with pre-serialized configuration snapshots,
+    which keep one rendered JSON document per environment
+
+    """
+
+    def __init__(self, database: Database) -> None:
+        """Construct a new :class: `SnapshotService`
+
+        :param `database` - an instance of `databases.Database`
+        for asynchronous work with database
+
+        """
+
+        self.database = database
+
+    async def refresh(self, env_ids: List[int]) -> None:
+        """Renders configurations of environments and stores them
+        as snapshots, must be called in the same transaction
+        as the write which changed environments
+
+        :param `env_ids` - identifiers of changed environments
+
+        """
+
+        rendered = (
+            select(
+                [
+                    environments_table.c.code,
+                    environments_table.c.id,
+                    self.version_column(),
+                    func.convert_to(
+                        cast(self.document_column(), Text),
+                        literal_column("'UTF8'")
+                    )
+                ]
+            )
+            .select_from(
+                environments_table.outerjoin(
+                    variables_table,
+                    and_(
+                        variables_table.c.env_id == environments_table.c.id,
+                        variables_table.c.is_deleted == False
+                    )
+                )
+            )
+            .where(
+                and_(
+                    environments_table.c.id == any_(
+                        bindparam('env_ids', env_ids, type_=ARRAY(Integer))
+                    ),
+                    environments_table.c.is_deleted == False
+                )
+            )
+            .group_by(environments_table.c.id)
+        )
+        query = insert(configuration_snapshots_table).from_select(
+            [
+                configuration_snapshots_table.c.code,
+                configuration_snapshots_table.c.env_id,
+                configuration_snapshots_table.c.version,
+                configuration_snapshots_table.c.document
+            ],
+            rendered
+        )
+        query = query.on_conflict_do_update(
+            index_elements=[configuration_snapshots_table.c.code],
+            set_={
+                'version': query.excluded.version,
+                'document': query.excluded.document
+            }
+        )
+
+        await self.database.execute(query)
+
+    async def remove(self, env_ids: List[int]) -> None:
+        """Removes snapshots of deleted environments
+
+        :param `env_ids` - identifiers of deleted environments
+
+        """
+
+        query = (
+            configuration_snapshots_table.delete()
+            .where(
+                configuration_snapshots_table.c.env_id == any_(
+                    bindparam('env_ids', env_ids, type_=ARRAY(Integer))
+                )
+            )
+        )
+
+        await self.database.execute(query)
+
+    async def get_by_code(self, code: str) -> Record:
+        """Selects snapshot by environment code
+
+        :param `code` - unique code of environment
+
+        :return an instance of `databases.backends.postgres.Record`
+        which provide environment identifier, version and
+        JSON document of configuration
+
+        """
+
+        query = (
+            select(
+                [
+                    configuration_snapshots_table.c.env_id,
+                    configuration_snapshots_table.c.version,
+                    configuration_snapshots_table.c.document
+                ]
+            )
+            .select_from(configuration_snapshots_table)
+            .where(configuration_snapshots_table.c.code == code)
+        )
+
+        return await self.database.fetch_one(query)
+
+    async def get_version_by_code(self, code: str) -> Record:
+        """Selects only environment identifier and version of snapshot
+
+        :param `code` - unique code of environment
+
+        :return an instance of `databases.backends.postgres.Record`
+        which provide environment identifier and version
+
+        """
+
+        query = (
+            select(
+                [
+                    configuration_snapshots_table.c.env_id,
+                    configuration_snapshots_table.c.version
+                ]
+            )
+            .select_from(configuration_snapshots_table)
+            .where(configuration_snapshots_table.c.code == code)
+        )
+
+        return await self.database.fetch_one(query)
+
+    async def iterate_by_codes(self, codes: List[str]) -> AsyncIterator[Record]:
+        """Selects snapshots of many environments from a server-side cursor
+
+        :param `codes` - unique codes of environments
+
+        :return async iterator of `databases.backends.postgres.Record`
+        which provide environment code, identifier, version and
+        JSON document of configuration
+
+        """
+
+        query = (
+            select(
+                [
+                    configuration_snapshots_table.c.code,
+                    configuration_snapshots_table.c.env_id,
+                    configuration_snapshots_table.c.version,
+                    configuration_snapshots_table.c.document
+                ]
+            )
+            .select_from(configuration_snapshots_table)
+            .where(
+                configuration_snapshots_table.c.code == any_(
+                    bindparam('codes', codes, type_=ARRAY(UUID(as_uuid=False)))
+                )
+            )
+        )
+
+        async for snapshot in self.database.iterate(query):
+            yield snapshot
+
+    @staticmethod
+    def version_column():
+        """Builds version of environment configuration, which is advanced
+        by `VariableService._bump_versions` in the transaction of every
+        write of variables
+
+        """
+
+        return func.coalesce(
+            environments_table.c.updated_at,
+            environments_table.c.created_at
+        ).label('version')
+
+    @staticmethod
+    def document_column():
+        """Builds JSON document of `ConfigurationSchema`
+        aggregated from joined environment and variables
+
+        """
+
+        variable = _json_object(
+            id=variables_table.c.id,
+            is_deleted=variables_table.c.is_deleted,
+            created_at=variables_table.c.created_at,
+            updated_at=variables_table.c.updated_at,
+            deleted_at=variables_table.c.deleted_at,
+            name=variables_table.c.name,
+            value=variables_table.c.value
+        )
+        variables = func.coalesce(
+            func.json_agg(
+                aggregate_order_by(variable, desc(variables_table.c.created_at))
+            ).filter(variables_table.c.id != None),
+            literal_column("'[]'::json")
+        )
+
+        return _json_object(
+            environment_name=environments_table.c.name,
+            variables=variables
+        )
+
+
+def _json_object(**fields):
+    """Builds `json_build_object` call with constant keys
+
+    """
+
+    arguments = []
+
+    for key, value in fields.items():
+        arguments.extend([literal_column(f"'{key}'"), value])
+
+    return func.json_build_object(*arguments)
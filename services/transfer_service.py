@@ -0,0 +1,370 @@
+import json
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+from asyncpg.exceptions import DataError, IntegrityConstraintViolationError, UniqueViolationError
+from databases import Database
+from sqlalchemy import Column, and_, func, select
+
+from models.applications import applications_table
+from models.environments import environments_table
+from models.variables import variables_table
+from .snapshot_service import SnapshotService
+
+
+# Imported environments start with the same version as their variables,
+# so clients syncing changes from version 0 receive all of them
+IMPORTED_VERSION = 1
+
+
+class TransferFormatError(Exception):
+    """Raised when imported document is malformed
+
+    """
+
+
+class TransferConflictError(Exception):
+    """Raised when imported environment code or variable name
+    is already taken
+
+    """
+
+
+class TransferService:
+    """Service for export and import of whole applications
+    with their environments and variables as NDJSON documents
+
+    Each line of document is a JSON object with `type` of entity:
+    the application goes first, then its environments,
+    then their variables.
+
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        snapshot_service: SnapshotService,
+        batch_size: int = 5000
+    ) -> None:
+        """Construct a new :class: `TransferService`
+
+        :param `database` - an instance of `databases.Database`
+        for asynchronous work with database
+
+        :param `snapshot_service` - an instance of `services.SnapshotService`
+        for rendering snapshots of imported environments
+
+        :optional param `batch_size` - number of rows loaded
+        by one `COPY` on import
+
+        """
+
+        self.database = database
+        self.snapshot_service = snapshot_service
+        self.batch_size = batch_size
+
+    async def export_application(self, id: int) -> AsyncIterator[bytes]:
+        """Yields NDJSON lines of application, its environments and variables
+        read from server-side cursors of one snapshot of the database,
+        so that memory usage does not depend on application size
+
+        :param `id` - application identifier
+
+        :return async iterator of lines, nothing is yielded
+        if application does not exist
+
+        """
+
+        applications = (
+            select(
+                [
+                    applications_table.c.id,
+                    applications_table.c.name,
+                    applications_table.c.description,
+                    applications_table.c.created_at,
+                    applications_table.c.updated_at
+                ]
+            )
+            .select_from(applications_table)
+            .where(
+                and_(
+                    applications_table.c.id == id,
+                    applications_table.c.is_deleted == False
+                )
+            )
+        )
+        environments = (
+            select(
+                [
+                    environments_table.c.id,
+                    environments_table.c.name,
+                    environments_table.c.code,
+                    environments_table.c.description,
+                    environments_table.c.created_at,
+                    environments_table.c.updated_at
+                ]
+            )
+            .select_from(environments_table)
+            .where(
+                and_(
+                    environments_table.c.app_id == id,
+                    environments_table.c.is_deleted == False
+                )
+            )
+            .order_by(environments_table.c.id)
+        )
+        variables = (
+            select(
+                [
+                    variables_table.c.id,
+                    variables_table.c.env_id,
+                    variables_table.c.name,
+                    variables_table.c.value,
+                    variables_table.c.created_at,
+                    variables_table.c.updated_at
+                ]
+            )
+            .select_from(
+                variables_table.join(
+                    environments_table,
+                    environments_table.c.id == variables_table.c.env_id
+                )
+            )
+            .where(
+                and_(
+                    environments_table.c.app_id == id,
+                    environments_table.c.is_deleted == False,
+                    variables_table.c.is_deleted == False
+                )
+            )
+            .order_by(variables_table.c.env_id, variables_table.c.id)
+        )
+
+        async with self.database.transaction(isolation='repeatable_read', readonly=True):
+            application = await self.database.fetch_one(applications)
+
+            if application is None:
+                return
+
+            yield _dump_line('application', application)
+
+            async for environment in self.database.iterate(environments):
+                yield _dump_line('environment', environment)
+
+            async for variable in self.database.iterate(variables):
+                yield _dump_line('variable', variable)
+
+    async def import_application(self, lines: AsyncIterator[bytes]) -> dict:
+        """Creates a new application from NDJSON lines in the format
+        of `export_application` in one transaction, rows are bulk loaded
+        by `COPY` in batches, so that memory usage does not depend
+        on application size
+
+        Environments keep their codes, identifiers are assigned anew.
+
+        :param `lines` - async iterator of NDJSON lines
+
+        :return dictionary with identifier of created application
+        and numbers of imported environments and variables
+
+        :raise `TransferFormatError` if document is malformed
+        or its values do not fit their columns
+
+        :raise `TransferConflictError` if environment code
+        or variable name is already taken
+
+        """
+
+        app_id = None
+        env_ids: Dict[int, int] = {}
+        environments = []
+        variables = []
+        counts = {'environments': 0, 'variables': 0}
+
+        try:
+            async with self.database.transaction():
+                # Rows written by COPY are stamped by the database clock too
+                now = await self.database.fetch_val(select([func.localtimestamp()]))
+
+                async with self.database.connection() as connection:
+                    copy_records = connection.raw_connection.copy_records_to_table
+
+                    async def flush_environments() -> None:
+                        # Identifiers are allocated before COPY,
+                        # so that variables are able to refer to environments
+                        ids = await self._next_ids(environments_table.name, len(environments))
+
+                        for index, new_id in enumerate(ids):
+                            env_ids[environments[index][0]] = new_id
+                            environments[index] = (new_id, *environments[index][1:])
+
+                        await copy_records(
+                            environments_table.name,
+                            records=environments,
+                            columns=['id', 'app_id', 'name', 'code', 'description', 'config_version', 'created_at', 'updated_at']
+                        )
+                        counts['environments'] += len(environments)
+                        environments.clear()
+
+                    async def flush_variables() -> None:
+                        await copy_records(
+                            variables_table.name,
+                            records=variables,
+                            columns=['env_id', 'name', 'value', 'config_version', 'created_at', 'updated_at']
+                        )
+                        counts['variables'] += len(variables)
+                        variables.clear()
+
+                    async for number, line in _enumerate(lines):
+                        if not line.strip():
+                            continue
+
+                        try:
+                            entity = json.loads(line)
+                            entity_type = entity['type']
+
+                            if (app_id is None) != (entity_type == 'application'):
+                                raise TransferFormatError('Document must start with the only application')
+
+                            if entity_type == 'application':
+                                app_id, = await self._next_ids(applications_table.name, 1)
+                                await copy_records(
+                                    applications_table.name,
+                                    records=[
+                                        (
+                                            app_id,
+                                            _parse_string(entity, applications_table.c.name),
+                                            _parse_string(entity, applications_table.c.description, required=False),
+                                            _parse_datetime(entity.get('created_at')) or now,
+                                            _parse_datetime(entity.get('updated_at'))
+                                        )
+                                    ],
+                                    columns=['id', 'name', 'description', 'created_at', 'updated_at']
+                                )
+                            elif entity_type == 'environment':
+                                if entity['id'] in env_ids:
+                                    raise TransferFormatError(f'Environment {entity["id"]} is declared twice')
+
+                                env_ids[entity['id']] = None
+                                environments.append(
+                                    (
+                                        entity['id'],
+                                        app_id,
+                                        _parse_string(entity, environments_table.c.name),
+                                        str(uuid.UUID(entity['code'])),
+                                        _parse_string(entity, environments_table.c.description, required=False),
+                                        IMPORTED_VERSION,
+                                        _parse_datetime(entity.get('created_at')) or now,
+                                        _parse_datetime(entity.get('updated_at'))
+                                    )
+                                )
+
+                                if len(environments) >= self.batch_size:
+                                    await flush_environments()
+                            elif entity_type == 'variable':
+                                if environments:
+                                    await flush_environments()
+
+                                if env_ids.get(entity['env_id']) is None:
+                                    raise TransferFormatError(
+                                        f'Environment {entity["env_id"]} is not declared before its variables'
+                                    )
+
+                                variables.append(
+                                    (
+                                        env_ids[entity['env_id']],
+                                        _parse_string(entity, variables_table.c.name),
+                                        _parse_string(entity, variables_table.c.value),
+                                        IMPORTED_VERSION,
+                                        _parse_datetime(entity.get('created_at')) or now,
+                                        _parse_datetime(entity.get('updated_at'))
+                                    )
+                                )
+
+                                if len(variables) >= self.batch_size:
+                                    await flush_variables()
+                            else:
+                                raise TransferFormatError(f'Unexpected entity type {entity_type}')
+                        except TransferFormatError as exc:
+                            raise TransferFormatError(f'Line {number}: {exc}')
+                        except (ValueError, KeyError, TypeError) as exc:
+                            raise TransferFormatError(f'Line {number}: {exc!r}')
+
+                    if app_id is None:
+                        raise TransferFormatError('Document does not contain application')
+
+                    if environments:
+                        await flush_environments()
+
+                    if variables:
+                        await flush_variables()
+
+                if env_ids:
+                    await self.snapshot_service.refresh(list(env_ids.values()))
+        except UniqueViolationError as exc:
+            raise TransferConflictError(exc.detail or f'{exc}')
+        except (DataError, IntegrityConstraintViolationError) as exc:
+            # Values which are not checked while parsing are rejected
+            # by the database for the whole batch
+            raise TransferFormatError(exc.detail or f'{exc}')
+
+        return {'id': app_id, **counts}
+
+    async def _next_ids(self, table_name: str, count: int) -> List[int]:
+        """Allocates identifiers from sequence of table
+
+        """
+
+        query = select([func.nextval(f'{table_name}_id_seq')]).select_from(
+            func.generate_series(1, count)
+        )
+
+        return [row[0] for row in await self.database.fetch_all(query)]
+
+
+async def _enumerate(lines: AsyncIterator[bytes]) -> AsyncIterator[tuple]:
+    number = 0
+
+    async for line in lines:
+        number += 1
+        yield number, line
+
+
+def _dump_line(type: str, row) -> bytes:
+    entity = {'type': type}
+
+    for key, value in row.items():
+        entity[key] = value.isoformat() if isinstance(value, datetime) else value
+
+    return json.dumps(entity, ensure_ascii=False).encode() + b'\n'
+
+
+def _parse_string(entity: dict, column: Column, required: bool = True) -> Optional[str]:
+    """Reads string field of imported entity and checks
+    that it fits into its column
+
+    """
+
+    value = entity[column.name] if required else entity.get(column.name)
+
+    if value is None:
+        if not column.nullable:
+            raise TransferFormatError(f'{column.name} is required')
+
+        return None
+
+    if not isinstance(value, str):
+        raise TransferFormatError(f'{column.name} must be a string')
+
+    if column.type.length is not None and len(value) > column.type.length:
+        raise TransferFormatError(f'{column.name} is longer than {column.type.length} characters')
+
+    return value
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    if value is None:
+        return None
+
+    return datetime.fromisoformat(value)
@@ -1,29 +1,78 @@
-from datetime import datetime
-from typing import List
+from typing import Dict, List, Optional
 
+from asyncpg.exceptions import UniqueViolationError
 from databases import Database
 from databases.backends.postgres import Record
-from sqlalchemy import desc, func, select, and_
-
+from sqlalchemy import BigInteger, Integer, Text, and_, any_, bindparam, cast, desc, func, literal, literal_column, or_, select
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by, insert
+
+from helpers.configuration_cache import ConfigurationCache
+from helpers.pagination import exact_total, paginate
+from helpers.projection import select_columns
+from models.applications import applications_table
+from models.change_history import change_history_table
+from models.environments import environments_table
 from models.variables import variables_table
 from .base_service import BaseService
+from .change_history_writer import ChangeHistoryWriter
+from .snapshot_service import SnapshotService
 from schemas.variable_schemas import VariableCreateSchema, VariableUpdateSchema
 
 
+SEARCH_MODES = ('prefix', 'substring', 'exact')
+
+SEARCH_FIELDS = ('name', 'value')
+
+# Trigram index is not able to narrow shorter patterns
+SEARCH_MIN_LENGTH = 3
+
+
+class VariableNameConflictError(Exception):
+    """Raised when environment already has a variable with the same name
+
+    """
+
+
+class InvalidSearchError(ValueError):
+    """Raised when search pattern is too short to be served by index
+
+    """
+
+
 class VariableService(BaseService):
     """Service for working with variable entities
 
     """
 
-    def __init__(self, database: Database) -> None:
+    def __init__(
+        self,
+        database: Database,
+        snapshot_service: SnapshotService,
+        configuration_cache: ConfigurationCache,
+        history_writer: ChangeHistoryWriter
+    ) -> None:
         """Construct a new :class: `VariableService`
 
         :param `database` - an instance of `databases.Database` 
         for asynchronous work with database
 
+        :param `snapshot_service` - an instance of `services.SnapshotService`
+        for keeping configuration snapshots current
+
+        :param `configuration_cache` - an instance of
+        `helpers.configuration_cache.ConfigurationCache`
+        which keeps rendered configurations
+
+        :param `history_writer` - an instance of
+        `services.ChangeHistoryWriter` which writes change history
+        of updated variables
+
         """
 
         self.database = database
+        self.snapshot_service = snapshot_service
+        self.configuration_cache = configuration_cache
+        self.history_writer = history_writer
 
     async def create(
         self, 
@@ -37,15 +86,20 @@ class VariableService(BaseService):
         :return an instance of `databases.backends.postgres.Record`
         which provide variable data
 
+        :raise `VariableNameConflictError` if environment
+        already has a variable with the same name
+
         """
 
         async with self.database.transaction():
+            versions = await self._bump_versions(environments_table.c.id == data.env_id)
             query = (variables_table.insert()
                 .values(
                     name=data.name,
                     value=data.value,
                     env_id=data.env_id,
-                    created_at=datetime.now()
+                    config_version=versions.get(data.env_id, 0),
+                    created_at=func.localtimestamp()
                 )
                 .returning(
                     variables_table.c.id,
@@ -57,8 +111,16 @@ class VariableService(BaseService):
                     variables_table.c.is_deleted
                 )
             )
+            try:
+                variable = await self.database.fetch_one(query)
+            except UniqueViolationError:
+                raise VariableNameConflictError(f'Variable {data.name} already exists!')
+
+            await self.snapshot_service.refresh([data.env_id])
+
+        self.configuration_cache.invalidate([data.env_id])
 
-            return await self.database.fetch_one(query)
+        return variable
 
     async def update(
         self,
@@ -66,6 +128,7 @@ class VariableService(BaseService):
         data: VariableUpdateSchema
     ) -> Record:
         """Updates an variable according to the passed data
+        and records change history of its fields
 
         :param `id` - identifier of variable
 
@@ -75,29 +138,234 @@ class VariableService(BaseService):
         :return an instance of `databases.backends.postgres.Record`
         which provide variable data
 
+        :raise `VariableNameConflictError` if environment
+        already has a variable with the same name
+
         """
 
+        history = [] if self.history_writer.is_write_behind else None
+
         async with self.database.transaction():
-            query = (
-                variables_table.update()
-                .where(variables_table.c.id == id)
-                .values(
-                    name=data.name,
-                    value=data.value,
-                    updated_at=datetime.now()
+            versions = await self._bump_versions(
+                environments_table.c.id == self._env_id_of(id)
+            )
+
+            if not versions:
+                return None
+
+            try:
+                variable = await self.update_with_history(
+                    variables_table,
+                    id,
+                    {
+                        'name': data.name,
+                        'value': data.value
+                    },
+                    [
+                        variables_table.c.id,
+                        variables_table.c.name,
+                        variables_table.c.value,
+                        variables_table.c.created_at,
+                        variables_table.c.updated_at,
+                        variables_table.c.deleted_at,
+                        variables_table.c.is_deleted,
+                        variables_table.c.env_id
+                    ],
+                    {'config_version': list(versions.values())[0]},
+                    history=history
                 )
-                .returning(
-                    variables_table.c.id,
-                    variables_table.c.name,
-                    variables_table.c.value,
-                    variables_table.c.created_at,
-                    variables_table.c.updated_at,
-                    variables_table.c.deleted_at,
-                    variables_table.c.is_deleted
+            except UniqueViolationError:
+                raise VariableNameConflictError(f'Variable {data.name} already exists!')
+
+            if variable is not None:
+                await self.snapshot_service.refresh([variable['env_id']])
+
+        if variable is not None:
+            self.configuration_cache.invalidate([variable['env_id']])
+
+        if history:
+            await self.history_writer.enqueue(history)
+
+        return variable
+
+    async def bulk_upsert(self, data: List[VariableCreateSchema]) -> List[dict]:
+        """Creates or updates many variables matched by environment
+        and name in a single transaction, the last of items with
+        the same environment and name wins
+
+        :param `data` - list of `VariableCreateSchema`
+        which provide data of variables
+
+        :return list of dictionaries with `env_id`, `name`, `status`
+        (`created`, `updated`, `unchanged` or `failed`), variable `id`
+        and `error` in the order of passed items
+
+        """
+
+        values = {(item.env_id, item.name): item.value for item in data}
+        results = {}
+        changed_env_ids = []
+        history = []
+
+        async with self.database.transaction():
+            # Locking environments in a stable order serializes concurrent
+            # writes of their variables and prevents deadlocks
+            query = (
+                select([environments_table.c.id])
+                .select_from(environments_table)
+                .where(
+                    and_(
+                        environments_table.c.id == any_(
+                            bindparam(
+                                'env_ids',
+                                sorted({env_id for env_id, _ in values}),
+                                type_=ARRAY(Integer)
+                            )
+                        ),
+                        environments_table.c.is_deleted == False
+                    )
                 )
+                .order_by(environments_table.c.id)
+                .with_for_update()
             )
-            
-            return await self.database.fetch_one(query)
+            env_ids = {row['id'] for row in await self.database.fetch_all(query)}
+
+            for key in values:
+                if key[0] not in env_ids:
+                    results[key] = {'status': 'failed', 'error': 'Environment not found'}
+
+            values = {key: value for key, value in values.items() if key not in results}
+
+            if values:
+                query = (
+                    select(
+                        [
+                            variables_table.c.id,
+                            variables_table.c.env_id,
+                            variables_table.c.name,
+                            variables_table.c.value
+                        ]
+                    )
+                    .select_from(variables_table)
+                    .where(
+                        and_(
+                            variables_table.c.env_id == any_(
+                                bindparam('env_ids', list(env_ids), type_=ARRAY(Integer))
+                            ),
+                            variables_table.c.name == any_(
+                                bindparam('names', [name for _, name in values], type_=ARRAY(Text))
+                            ),
+                            variables_table.c.is_deleted == False
+                        )
+                    )
+                )
+                existing = {
+                    (row['env_id'], row['name']): row
+                    for row in await self.database.fetch_all(query)
+                }
+
+                for key, variable in existing.items():
+                    if key in values and values[key] == variable['value']:
+                        results[key] = {'status': 'unchanged', 'id': variable['id']}
+
+                values = {key: value for key, value in values.items() if key not in results}
+
+            if values:
+                versions = await self._bump_versions(
+                    environments_table.c.id == any_(
+                        bindparam(
+                            'changed_env_ids',
+                            sorted({env_id for env_id, _ in values}),
+                            type_=ARRAY(Integer)
+                        )
+                    )
+                )
+
+                # Arrays are unnested into rows, so the statement
+                # has the same five parameters for any number of items
+                rows = select(
+                    [
+                        func.unnest(
+                            cast(bindparam('item_env_ids', [env_id for env_id, _ in values]), ARRAY(Integer))
+                        ),
+                        func.unnest(
+                            cast(bindparam('item_names', [name for _, name in values]), ARRAY(Text))
+                        ),
+                        func.unnest(
+                            cast(bindparam('item_values', list(values.values())), ARRAY(Text))
+                        ),
+                        func.unnest(
+                            cast(
+                                bindparam('item_versions', [versions[env_id] for env_id, _ in values]),
+                                ARRAY(BigInteger)
+                            )
+                        ),
+                        func.localtimestamp()
+                    ]
+                )
+                query = insert(variables_table).from_select(
+                    [
+                        variables_table.c.env_id,
+                        variables_table.c.name,
+                        variables_table.c.value,
+                        variables_table.c.config_version,
+                        variables_table.c.created_at
+                    ],
+                    rows
+                )
+                query = (
+                    query.on_conflict_do_update(
+                        index_elements=[variables_table.c.env_id, variables_table.c.name],
+                        index_where=variables_table.c.is_deleted == False,
+                        set_={
+                            'value': query.excluded.value,
+                            'config_version': query.excluded.config_version,
+                            'updated_at': func.localtimestamp()
+                        }
+                    )
+                    .returning(
+                        variables_table.c.id,
+                        variables_table.c.env_id,
+                        variables_table.c.name,
+                        variables_table.c.value,
+                        variables_table.c.updated_at
+                    )
+                )
+
+                for variable in await self.database.fetch_all(query):
+                    key = (variable['env_id'], variable['name'])
+
+                    if key in existing:
+                        results[key] = {'status': 'updated', 'id': variable['id']}
+                        history.append(
+                            {
+                                'entity_id': variable['id'],
+                                'entity_type': 'variables',
+                                'field': 'value',
+                                'old_value': existing[key]['value'],
+                                'new_value': variable['value'],
+                                'created_at': variable['updated_at']
+                            }
+                        )
+                    else:
+                        results[key] = {'status': 'created', 'id': variable['id']}
+
+                if history and not self.history_writer.is_write_behind:
+                    await self.database.execute(change_history_table.insert().values(history))
+
+                changed_env_ids = sorted(versions)
+                await self.snapshot_service.refresh(changed_env_ids)
+
+        if changed_env_ids:
+            self.configuration_cache.invalidate(changed_env_ids)
+
+        if history and self.history_writer.is_write_behind:
+            await self.history_writer.enqueue(history)
+
+        return [
+            {'env_id': item.env_id, 'name': item.name, **results[(item.env_id, item.name)]}
+            for item in data
+        ]
 
     async def delete(self, id: int):
         """Deletes an variable according passed variable identifier
@@ -107,15 +375,27 @@ class VariableService(BaseService):
         """
 
         async with self.database.transaction():
+            versions = await self._bump_versions(
+                environments_table.c.id == self._env_id_of(id)
+            )
+
+            if not versions:
+                return
+
+            env_id, version = list(versions.items())[0]
             query = (
                 variables_table.update()
                 .where(variables_table.c.id == id)
                 .values(
                     is_deleted=True,
-                    deleted_at=datetime.now()
+                    deleted_at=func.localtimestamp(),
+                    config_version=version
                 )
             )
             await self.database.execute(query)
+            await self.snapshot_service.refresh([env_id])
+
+        self.configuration_cache.invalidate([env_id])
 
     async def get_one(self, id: int) -> Record:
         """Selects variable by its id from the database
@@ -149,7 +429,10 @@ class VariableService(BaseService):
         self,
         env_id: int,
         page: int = None,
-        per_page: int = None
+        per_page: int = None,
+        cursor: Optional[str] = None,
+        include_total: bool = False,
+        fields: Optional[List[str]] = None
     ) -> List[Record]:
         """Selects all variables for environment from the database
 
@@ -159,12 +442,121 @@ class VariableService(BaseService):
 
         :optional param `per_page` - number of entities on one page
 
+        :optional param `cursor` - cursor of the previous page,
+        page number is ignored if it is passed
+
+        :optional param `include_total` - whether to select total number
+        of entities as `total_count` column of every row
+
+        :optional param `fields` - names of selected columns,
+        identifier and creation date are always selected
+
         :return list of `databases.backends.postgres.Record`
         which provide variable data
 
+        :raise `helpers.pagination.InvalidCursorError` if cursor is malformed
+
+        :raise `helpers.projection.InvalidFieldsError` if some of fields
+        is not a column
+
         """
 
         query = (
+            select(
+                select_columns(
+                    [
+                        variables_table.c.id,
+                        variables_table.c.name,
+                        variables_table.c.value,
+                        variables_table.c.created_at,
+                        variables_table.c.updated_at,
+                        variables_table.c.deleted_at,
+                        variables_table.c.is_deleted
+                    ],
+                    fields
+                )
+            )
+            .select_from(variables_table)
+            .where(
+                and_(
+                    variables_table.c.env_id == env_id,
+                    variables_table.c.is_deleted == False
+                )
+            )
+        )
+
+        query = paginate(
+            query,
+            variables_table,
+            per_page,
+            page,
+            cursor,
+            exact_total() if include_total else None
+        )
+
+        return await self.database.fetch_all(query)
+
+    async def search(
+        self,
+        query: str,
+        field: Optional[str] = None,
+        mode: str = 'substring',
+        per_page: int = 10,
+        cursor: Optional[str] = None
+    ) -> List[Record]:
+        """Searches variables of all applications by name or value,
+        matches are found by trigram indexes of `name` and `value`,
+        exact matches by btree indexes of `name` and `md5(value)`,
+        and returned with names of their environments and applications
+
+        :param `query` - searched text, `%` and `_` match themselves
+
+        :optional param `field` - `name` or `value`, both fields
+        are searched if it is `None`
+
+        :optional param `mode` - `prefix`, `substring` or `exact`
+
+        :optional param `per_page` - number of variables on one page
+
+        :optional param `cursor` - cursor of the previous page
+
+        :return list of `databases.backends.postgres.Record`
+        which provide variable data, `environment_name`
+        and `application_name`
+
+        :raise `InvalidSearchError` if prefix or substring
+        is shorter than `SEARCH_MIN_LENGTH`
+
+        :raise `helpers.pagination.InvalidCursorError` if cursor is malformed
+
+        """
+
+        if mode != 'exact' and len(query) < SEARCH_MIN_LENGTH:
+            raise InvalidSearchError(
+                f'Search query must have at least {SEARCH_MIN_LENGTH} characters!'
+            )
+
+        if field is not None:
+            columns = [variables_table.c[field]]
+        else:
+            columns = [variables_table.c.name, variables_table.c.value]
+
+        conditions = []
+
+        for column in columns:
+            if mode == 'exact':
+                # Trigram indexes serve equality only since PostgreSQL 14,
+                # so exact search is served by btree indexes
+                if column is variables_table.c.value:
+                    conditions.append(and_(func.md5(column) == func.md5(cast(query, Text)), column == query))
+                else:
+                    conditions.append(column == query)
+            elif mode == 'prefix':
+                conditions.append(column.startswith(query, autoescape=True))
+            else:
+                conditions.append(column.contains(query, autoescape=True))
+
+        statement = (
             select(
                 [
                     variables_table.c.id,
@@ -173,22 +565,126 @@ class VariableService(BaseService):
                     variables_table.c.created_at,
                     variables_table.c.updated_at,
                     variables_table.c.deleted_at,
-                    variables_table.c.is_deleted
+                    variables_table.c.is_deleted,
+                    variables_table.c.env_id,
+                    environments_table.c.name.label('environment_name'),
+                    environments_table.c.app_id,
+                    applications_table.c.name.label('application_name')
                 ]
             )
-            .select_from(variables_table)
+            .select_from(
+                variables_table
+                .join(environments_table, environments_table.c.id == variables_table.c.env_id)
+                .join(applications_table, applications_table.c.id == environments_table.c.app_id)
+            )
             .where(
                 and_(
-                    variables_table.c.env_id == env_id,
-                    variables_table.c.is_deleted == False
+                    or_(*conditions),
+                    variables_table.c.is_deleted == False,
+                    environments_table.c.is_deleted == False,
+                    applications_table.c.is_deleted == False
+                )
+            )
+        )
+
+        statement = paginate(statement, variables_table, per_page, cursor=cursor)
+
+        return await self.database.fetch_all(statement)
+
+    async def get_values_by_code(self, code: str) -> Record:
+        """Selects only names and values of not deleted variables
+        of environment that matches the passed code
+
+        :param `code` - unique code of environment
+
+        :return an instance of `databases.backends.postgres.Record`
+        which provide environment identifier, version and JSON object
+        of variable values by their names, the newest variable
+        wins among variables with the same name
+
+        """
+
+        values = func.coalesce(
+            func.json_object_agg(
+                variables_table.c.name,
+                aggregate_order_by(variables_table.c.value, variables_table.c.created_at)
+            ).filter(variables_table.c.name != None),
+            literal_column("'{}'::json")
+        )
+        query = (
+            select(
+                [
+                    environments_table.c.id,
+                    SnapshotService.version_column(),
+                    cast(values, Text).label('document')
+                ]
+            )
+            .select_from(
+                environments_table.outerjoin(
+                    variables_table,
+                    and_(
+                        variables_table.c.env_id == environments_table.c.id,
+                        variables_table.c.is_deleted == False
+                    )
                 )
             )
-            .order_by(desc(variables_table.c.created_at))
+            .where(
+                and_(
+                    environments_table.c.code == code,
+                    environments_table.c.is_deleted == False
+                )
+            )
+            .group_by(environments_table.c.id)
         )
 
-        if page and per_page:
-            offset = (page - 1) * per_page
-            query = query.limit(per_page).offset(offset)
+        return await self.database.fetch_one(query)
+
+    async def get_changes_by_code(self, code: str, since: int) -> List[Record]:
+        """Selects variables of environment that matches the passed code,
+        which were created, updated or deleted after the passed version
+
+        :param `code` - unique code of environment
+
+        :param `since` - configuration version known by client
+
+        :return list of `databases.backends.postgres.Record`
+        which provide current configuration version of environment and
+        variable data ordered by version, variable columns are `None`
+        in the only record if nothing has changed, empty list if
+        environment does not exist
+
+        """
+
+        query = (
+            select(
+                [
+                    environments_table.c.config_version.label('version'),
+                    variables_table.c.id,
+                    variables_table.c.name,
+                    variables_table.c.value,
+                    variables_table.c.created_at,
+                    variables_table.c.updated_at,
+                    variables_table.c.deleted_at,
+                    variables_table.c.is_deleted
+                ]
+            )
+            .select_from(
+                environments_table.outerjoin(
+                    variables_table,
+                    and_(
+                        variables_table.c.env_id == environments_table.c.id,
+                        variables_table.c.config_version > since
+                    )
+                )
+            )
+            .where(
+                and_(
+                    environments_table.c.code == code,
+                    environments_table.c.is_deleted == False
+                )
+            )
+            .order_by(variables_table.c.config_version)
+        )
 
         return await self.database.fetch_all(query)
 
@@ -214,20 +710,116 @@ class VariableService(BaseService):
         
         return await self.database.fetch_val(query)
 
-    async def delete_by_env_id(self, env_id):
-        """Deletes all variables by environmetn identifier
+    async def copy_by_env_id(self, env_id: int, target_env_id: int) -> None:
+        """Copies not deleted variables of environment to another one
+        by a single `INSERT ... SELECT`, must be called in the same
+        transaction as the creation of target environment, which also
+        renders its snapshot
 
-        :param `env_id` - identifier of environment
+        :param `env_id` - identifier of source environment
+
+        :param `target_env_id` - identifier of target environment
 
         """
 
-        async with self.database.transaction():
-            query = (
-                variables_table.update()
-                .where(variables_table.c.env_id == env_id)
-                .values(
-                    is_deleted=True,
-                    deleted_at=datetime.now()
+        versions = await self._bump_versions(environments_table.c.id == target_env_id)
+        rows = (
+            select(
+                [
+                    cast(literal(target_env_id), Integer),
+                    variables_table.c.name,
+                    variables_table.c.value,
+                    cast(literal(versions[target_env_id]), BigInteger),
+                    func.localtimestamp()
+                ]
+            )
+            .select_from(variables_table)
+            .where(
+                and_(
+                    variables_table.c.env_id == env_id,
+                    variables_table.c.is_deleted == False
                 )
             )
-            await self.database.execute(query)
+        )
+        query = variables_table.insert().from_select(
+            [
+                variables_table.c.env_id,
+                variables_table.c.name,
+                variables_table.c.value,
+                variables_table.c.config_version,
+                variables_table.c.created_at
+            ],
+            rows
+        )
+        await self.database.execute(query)
+
+    async def delete_by_env_ids(self, env_ids: List[int]) -> None:
+        """Deletes all variables of environments in a single statement,
+        must be called in the same transaction as the deletion
+        of environments, which also removes their snapshots
+
+        :param `env_ids` - identifiers of environments
+
+        """
+
+        query = (
+            variables_table.update()
+            .where(
+                and_(
+                    variables_table.c.env_id == any_(
+                        bindparam('env_ids', env_ids, type_=ARRAY(Integer))
+                    ),
+                    variables_table.c.is_deleted == False
+                )
+            )
+            .values(
+                is_deleted=True,
+                deleted_at=func.localtimestamp()
+            )
+        )
+        await self.database.execute(query)
+
+    async def _bump_versions(self, condition) -> Dict[int, int]:
+        """Advances configuration version of environments once
+        per write statement, must be called in the same transaction
+        before their variables are written with the returned versions
+
+        Update keeps environment rows locked until commit,
+        so versions of environment follow commit order
+        and clients syncing changes do not miss any of them.
+
+        :param `condition` - condition on environments to update
+
+        :return new versions by environment identifiers
+
+        """
+
+        query = (
+            environments_table.update()
+            .where(condition)
+            .values(
+                config_version=environments_table.c.config_version + 1,
+                updated_at=func.localtimestamp()
+            )
+            .returning(
+                environments_table.c.id,
+                environments_table.c.config_version
+            )
+        )
+
+        return {
+            row['id']: row['config_version']
+            for row in await self.database.fetch_all(query)
+        }
+
+    @staticmethod
+    def _env_id_of(id: int):
+        """Builds subquery of environment identifier of variable
+
+        """
+
+        return (
+            select([variables_table.c.env_id])
+            .where(variables_table.c.id == id)
+            .as_scalar()
+        )
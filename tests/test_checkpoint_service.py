@@ -0,0 +1,18 @@
+from datetime import datetime
+
+import pytest
+
+from services.checkpoint_service import _parse_timestamp
+
+
+@pytest.mark.parametrize(
+    'value, expected',
+    [
+        ('2026-01-01T10:00:00', datetime(2026, 1, 1, 10)),
+        ('2026-01-01T10:00:00.5', datetime(2026, 1, 1, 10, 0, 0, 500000)),
+        ('2026-01-01T10:00:00.12345', datetime(2026, 1, 1, 10, 0, 0, 123450)),
+        (None, None)
+    ]
+)
+def test_checkpoint_timestamps_with_trimmed_fractions(value, expected):
+    assert _parse_timestamp(value) == expected
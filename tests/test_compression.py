@@ -0,0 +1,32 @@
+import gzip
+import json
+
+import pytest
+
+from helpers.compression import Compressor
+
+
+@pytest.mark.parametrize(
+    'accept_encoding, size, expected',
+    [
+        ('gzip, deflate', 2048, 'gzip'),
+        ('gzip;q=0, identity', 2048, None),
+        ('gzip;q=0.5, br;q=0', 2048, 'gzip'),
+        ('gzip', 100, None),
+        (None, 2048, None)
+    ]
+)
+def test_compression_negotiation(accept_encoding, size, expected):
+    compressor = Compressor(min_size=1024)
+
+    assert compressor.negotiate(accept_encoding, size) == expected
+
+
+def test_compressed_content_is_cached_by_version():
+    compressor = Compressor(min_size=0)
+    content = json.dumps({'value': 'x' * 2048}).encode()
+    compressed = compressor.compress(content, 'gzip', '"etag"')
+
+    assert compressor.compress(content, 'gzip', '"etag"') is compressed
+    assert gzip.decompress(compressed) == content
+    assert compressor.get_stats() == {'compressions': 1, 'compressed_hits': 1}
@@ -0,0 +1,19 @@
+from helpers.configuration_cache import ConfigurationCache
+
+
+def test_cache_peek_does_not_count_reads():
+    cache = ConfigurationCache(max_size=10, ttl=60)
+    cache.set('code', 1, {'etag': '"1"'})
+
+    assert cache.peek('code') == {'etag': '"1"'}
+    assert cache.peek('other') is None
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_cache_skips_values_loaded_before_invalidation():
+    cache = ConfigurationCache(max_size=10, ttl=60)
+    generation = cache.generation
+    cache.invalidate([1])
+    cache.set('code', 1, {'etag': '"1"'}, generation=generation)
+
+    assert cache.peek('code') is None
@@ -0,0 +1,13 @@
+from helpers import configuration_formats
+
+
+def test_dotenv_skips_names_which_corrupt_file():
+    content = configuration_formats.render(
+        {'HOST': 'db "main"\n', 'BAD NAME': 'x', 'INJECTED=1\nOTHER': 'y'},
+        configuration_formats.DOTENV
+    ).decode()
+
+    assert content == (
+        '# Skipped variables with names not valid in .env: 2\n'
+        'HOST="db \\"main\\"\\n"\n'
+    )
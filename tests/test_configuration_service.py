@@ -0,0 +1,74 @@
+import asyncio
+import gzip
+import uuid
+from datetime import datetime
+
+import pytest
+
+from helpers.compression import Compressor
+from helpers.configuration_cache import ConfigurationCache
+from services.change_notification_service import ChangeNotificationService, SubscriptionLimitError
+from services.configuration_service import ConfigurationService
+
+
+def test_bulk_configurations_are_keyed_by_passed_codes():
+    code = uuid.uuid4()
+
+    class SnapshotService:
+        async def iterate_by_codes(self, codes):
+            assert codes == [code.hex]
+            yield {'code': code, 'env_id': 1, 'version': datetime(2026, 1, 1), 'document': b'{}'}
+
+    cache = ConfigurationCache(max_size=10, ttl=60)
+    service = ConfigurationService(SnapshotService(), None, None, cache, None, None, None)
+
+    async def read():
+        return [
+            configuration['code']
+            async for configuration in service.iterate_configurations([str(code), code.hex, 'invalid'])
+        ]
+
+    assert asyncio.run(read()) == [str(code), code.hex]
+    assert cache.peek(code.hex) is not None
+
+
+def test_stream_subscribes_only_once_iterated():
+    notifications = ChangeNotificationService('', ConfigurationCache(max_size=10, ttl=60), max_subscribers=1)
+    service = ConfigurationService(None, None, None, None, notifications, None, None)
+
+    async def get_configuration(code):
+        return {'etag': '"1"'}
+
+    service.get_configuration = get_configuration
+
+    async def stream():
+        configurations = service.stream_configuration('code')
+
+        # Iterator which is never started holds no subscription
+        await configurations.aclose()
+        assert notifications._subscriptions_count == 0
+
+        configurations = service.stream_configuration('code')
+        assert await configurations.__anext__() == {'etag': '"1"'}
+        assert notifications._subscriptions_count == 1
+
+        with pytest.raises(SubscriptionLimitError):
+            service.stream_configuration('code')
+
+        await configurations.aclose()
+        assert notifications._subscriptions_count == 0
+
+    asyncio.run(stream())
+
+
+def test_compressed_configuration_has_etag_of_its_encoding():
+    service = ConfigurationService(None, None, None, None, None, None, Compressor(min_size=0))
+    configuration = {'etag': '"digest"', 'content': b'{}' * 1024}
+
+    content, encoding, etag = service.encode_configuration(configuration, 'gzip')
+
+    assert (encoding, etag) == ('gzip', '"digest-gzip"')
+    assert gzip.decompress(content) == configuration['content']
+    assert service.encode_configuration(configuration, 'identity') == (configuration['content'], None, '"digest"')
+    assert ConfigurationService.strip_encoding(etag) == '"digest"'
+    assert ConfigurationService.strip_encoding('"digest"') == '"digest"'
@@ -0,0 +1,24 @@
+from datetime import datetime
+
+import pytest
+
+from helpers.pagination import InvalidCursorError, decode_cursor, encode_cursor, next_cursor
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 10, 17, 12, 30, 15, 120000)
+
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+
+@pytest.mark.parametrize('cursor', ['', 'not a cursor', encode_cursor(datetime.now(), 1)[:-4]])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
+
+
+def test_next_cursor_is_missing_on_the_last_page():
+    rows = [{'id': 2, 'created_at': datetime(2026, 1, 2)}, {'id': 1, 'created_at': datetime(2026, 1, 1)}]
+
+    assert next_cursor(rows, 3) is None
+    assert decode_cursor(next_cursor(rows, 2)) == (datetime(2026, 1, 1), 1)
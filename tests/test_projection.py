@@ -0,0 +1,16 @@
+import pytest
+
+from helpers.projection import InvalidFieldsError, parse_fields, project, select_columns
+from models.variables import variables_table
+
+
+def test_projection_keeps_columns_required_for_pagination():
+    columns = [variables_table.c.id, variables_table.c.name, variables_table.c.value, variables_table.c.created_at]
+    fields = parse_fields(' name, name ,')
+
+    assert fields == ['name']
+    assert [column.name for column in select_columns(columns, fields)] == ['id', 'name', 'created_at']
+    assert project([{'id': 1, 'name': 'A', 'created_at': None}], fields) == [{'name': 'A'}]
+
+    with pytest.raises(InvalidFieldsError):
+        select_columns(columns, ['secret'])
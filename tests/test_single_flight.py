@@ -0,0 +1,27 @@
+import asyncio
+import contextvars
+
+from helpers.single_flight import SingleFlight
+
+
+connection = contextvars.ContextVar('connection', default=None)
+
+
+def test_shared_call_does_not_inherit_context_of_first_caller():
+    single_flight = SingleFlight()
+
+    async def load():
+        await asyncio.sleep(0)
+
+        return connection.get()
+
+    async def request(name):
+        connection.set(name)
+
+        return await single_flight.do('key', load)
+
+    async def run():
+        return await asyncio.gather(request('first'), request('second'))
+
+    assert asyncio.run(run()) == [None, None]
+    assert single_flight.get_stats() == {'in_flight': 0, 'calls': 1, 'coalesced': 1}
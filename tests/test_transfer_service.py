@@ -0,0 +1,19 @@
+import pytest
+
+from models.environments import environments_table
+from models.variables import variables_table
+from services.transfer_service import TransferFormatError, _parse_string
+
+
+def test_imported_strings_must_fit_their_columns():
+    assert _parse_string({'name': 'HOST'}, variables_table.c.name) == 'HOST'
+    assert _parse_string({}, environments_table.c.description, required=False) is None
+
+    with pytest.raises(TransferFormatError):
+        _parse_string({'name': 'x' * 256}, variables_table.c.name)
+
+    with pytest.raises(TransferFormatError):
+        _parse_string({'value': 1}, variables_table.c.value)
+
+    with pytest.raises(KeyError):
+        _parse_string({}, variables_table.c.name)